@@ -1,5 +1,10 @@
 from enum import Enum
 
+from schedule import at
+
+# Parameters of the reference room, for the parameters a sweep or an ensemble leaves out
+defaults = {'Tr': 18, 'Tac': 35, 'Tout': 15, 'k': 0.03, 'kac': 0.1, 'Tc_low': 22, 'Tc_high': 24, 'mode': 'HEAT'}
+
 
 class Mode(Enum):
     COOL = 1
@@ -11,82 +16,217 @@ class State(Enum):
     STOP = 2
 
 
-class AirConditioner:
+def crosses(Tr, acting, cool, Tc_low, Tc_high):
+    """
+    The hysteresis rule, shared by every controller and compiled as is by kernels.
+
+    :param Tr: room temperature - float
+    :param acting: whether the air conditioner is acting - bool
+    :param cool: whether it cools - bool
+    :param Tc_low, Tc_high: control temperatures in force - float
+    :return: whether Tr ends the current state - bool
+    """
+    if cool:
+        return Tr <= Tc_low if acting else Tr > Tc_high
+    return Tr >= Tc_high if acting else Tr < Tc_low
+
+
+def toggle(t, acting, book):
+    """
+    Bookkeeping of a switch at t, shared by every controller and compiled as is by kernels.
+
+    :param t: time - float
+    :param acting: whether the air conditioner was acting - bool
+    :param book: period_clock, period, last_start_moment, action_time, updated in place - list or array
+    :return: whether it acts afterwards - bool
+    """
+    if acting:
+        book[3] += t - book[2]
+        if book[1] == -1:
+            if book[0] == -1:
+                book[0] = t
+            else:
+                book[1] = t - book[0]
+        return False
+    book[2] = t
+    return True
+
+
+class Controller:
+    """
+    State, switching and period/action time bookkeeping of one run. self.model is the AirConditioner giving
+    the right-hand side and the control temperatures.
+    """
+
+    def reset_timer(self):
+        self.period_clock = -1
+        self.period = -1
+        self.last_start_moment = 0
+        self.action_time = 0
+
+    def flow(self, t, Tr):
+        """
+        Right-hand side for the current state, without any switching.
+
+        :param t: time - float
+        :param Tr: room temperature - float
+        :return: dTr/dt - float
+        """
+        return self.model.rhs(t, Tr, self.state)
+
+    def flow_t(self, t, Tr):
+        return self.model.rhs_t(t, Tr, self.state)
+
+    def flow_y(self, t, Tr):
+        return self.model.rhs_y(t, Tr, self.state)
+
+    def switch_distance(self, t, Tr):
+        """
+        :param t: time - float
+        :param Tr: room temperature - float
+        :return: signed distance to the control temperature that ends the current state, <= 0 once crossed - float
+        """
+        ac = self.model
+        if (ac.mode == Mode.COOL) == (self.state == State.ACTING):
+            return Tr - at(ac.Tc_low, t)
+        return at(ac.Tc_high, t) - Tr
+
+    def switch(self, t, Tr):
+        """
+        Toggles the state at time t and updates the period and action time.
+
+        :param t: time - float
+        :param Tr: room temperature - float
+        """
+        book = [self.period_clock, self.period, self.last_start_moment, self.action_time]
+        acting = toggle(t, self.state == State.ACTING, book)
+        self.period_clock, self.period, self.last_start_moment, self.action_time = book
+        self.state = State.ACTING if acting else State.STOP
+
+    def commit(self, t, Tr):
+        """
+        Called once per accepted step, switches if the new point crossed a control temperature.
+
+        :param t: time - float
+        :param Tr: room temperature - float
+        :return: whether it switched - bool
+        """
+        if self.model.crossed(Tr, self.state, t):
+            self.switch(t, Tr)
+            return True
+        return False
+
+    def save(self):
+        """
+        :return: controller state and bookkeeping, enough to resume a run - tuple
+        """
+        return self.state, self.period_clock, self.period, self.last_start_moment, self.action_time
+
+    def restore(self, saved):
+        """
+        :param saved: output of save
+        """
+        self.state, self.period_clock, self.period, self.last_start_moment, self.action_time = saved
+
+    def get_period(self):
+        return self.period
+
+    def get_action_time(self):
+        return self.action_time
+
+
+class AirConditioner(Controller):
     def __init__(self, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode):
         """
         :param Tr: room temperature - float
-        :param Tac: coils' temperature - int
-        :param Tout: outside air temperature - int
+        :param Tac: coils' temperature - int or Schedule
+        :param Tout: outside air temperature - int or Schedule
         :param k, kac: cooling coefficients - float
-        :param Tc_low, Tc_high: control temperature - int
+        :param Tc_low, Tc_high: control temperature - int or Schedule
         """
         if k < 0 or kac < 0:
             print("Please check cooling coefficients' coherence.")
             return
-        if Tc_low > Tc_high:
+        if at(Tc_low, 0) > at(Tc_high, 0):
             print("Please check control temperature coherence.")
             return
+        self.model = self
         self.Tac = Tac
         self.Tout = Tout
         self.k = k
         self.kac = kac
-        self.period_clock = -1
-        self.period = -1
-        self.last_start_moment = 0
-        self.action_time = 0
+        self.reset_timer()
         self.Tc_low = Tc_low
         self.Tc_high = Tc_high
         self.mode = mode
-        if mode == Mode.COOL:
-            if Tr > Tc_low:
-                self.state = State.ACTING
-            else:
-                self.state = State.STOP
-        else:
-            if Tr < Tc_high:
-                self.state = State.ACTING
-            else:
-                self.state = State.STOP
+        self.state = self.initial_state(Tr)
+
+    def initial_state(self, Tr, t=0):
+        """
+        :param Tr: initial room temperature - float
+        :param t: initial time - float
+        :return: State
+        """
+        if self.mode == Mode.COOL:
+            if Tr > at(self.Tc_low, t):
+                return State.ACTING
+            return State.STOP
+        if Tr < at(self.Tc_high, t):
+            return State.ACTING
+        return State.STOP
+
+    def crossed(self, Tr, state, t=0):
+        """
+        :param Tr: room temperature - float
+        :param state: State
+        :param t: time - float
+        :return: whether Tr ends the given state - bool
+        """
+        return crosses(Tr, state == State.ACTING, self.mode == Mode.COOL, at(self.Tc_low, t), at(self.Tc_high, t))
+
+    def rhs(self, t, Tr, state):
+        """
+        Pure right-hand side: never touches the instance, so it can be shared across runs and threads.
+
+        :param t: time - float
+        :param Tr: room temperature - float
+        :param state: State
+        :return: dTr/dt - float
+        """
+        if state == State.ACTING:
+            return self.k * (at(self.Tout, t) - Tr) + self.kac * (at(self.Tac, t) - Tr)
+        return self.k * (at(self.Tout, t) - Tr)
+
+    def rhs_t(self, t, Tr, state):
+        """
+        :param t: time - float
+        :param Tr: room temperature - float
+        :param state: State
+        :return: 0
+        """
+        return 0
+
+    def rhs_y(self, t, Tr, state):
+        """
+        :param t: time - float
+        :param Tr: room temperature - float
+        :param state: State
+        :return: d(dTr/dt)/dTr - float
+        """
+        if state == State.ACTING:
+            return -self.k - self.kac
+        return -self.k
 
     def act(self, t, Tr):
         """
+        Switches first if Tr crossed a control temperature, as the original integrators expect.
+
         :param t: time - float
         :param Tr: room temperature - float
         :return: dTr/dt - float
         """
-        if self.mode == Mode.COOL:
-            if self.state == State.ACTING:
-                if Tr <= self.Tc_low:
-                    self.state = State.STOP
-                    self.action_time += t - self.last_start_moment
-                    if self.period == -1:
-                        if self.period_clock == -1:
-                            self.period_clock = t
-                        else:
-                            self.period = t - self.period_clock
-                    return self.k * (self.Tout - Tr)
-                return self.k * (self.Tout - Tr) + self.kac * (self.Tac - Tr)
-            if Tr > self.Tc_high:
-                self.state = State.ACTING
-                self.last_start_moment = t
-                return self.k * (self.Tout - Tr) + self.kac * (self.Tac - Tr)
-            return self.k * (self.Tout - Tr)
-        if self.state == State.ACTING:
-            if Tr >= self.Tc_high:
-                self.state = State.STOP
-                self.action_time += t - self.last_start_moment
-                if self.period == -1:
-                    if self.period_clock == -1:
-                        self.period_clock = t
-                    else:
-                        self.period = t - self.period_clock
-                return self.k * (self.Tout - Tr)
-            return self.k * (self.Tout - Tr) + self.kac * (self.Tac - Tr)
-        if Tr < self.Tc_low:
-            self.state = State.ACTING
-            self.last_start_moment = t
-            return self.k * (self.Tout - Tr) + self.kac * (self.Tac - Tr)
-        return self.k * (self.Tout - Tr)
+        self.commit(t, Tr)
+        return self.rhs(t, Tr, self.state)
 
     def act_t(self, t, Tr):
         """
@@ -98,38 +238,28 @@ class AirConditioner:
 
     def act_y(self, t, Tr):
         """
+        Toggles the state without any bookkeeping if Tr crossed a control temperature.
+
         :param t: time - float
         :param Tr: room temperature - float
-        :return: dTr/dt - float
+        :return: d(dTr/dt)/dTr - float
         """
-        if self.mode == Mode.COOL:
-            if self.state == State.ACTING:
-                if Tr <= self.Tc_low:
-                    self.state = State.STOP
-                    return -self.k
-                return -self.k - self.kac
-            if Tr > self.Tc_high:
-                self.state = State.ACTING
-                return -self.k - self.kac
-            return -self.k
-        if self.state == State.ACTING:
-            if Tr >= self.Tc_high:
-                self.state = State.STOP
-                return -self.k
-            return -self.k - self.kac
-        if Tr < self.Tc_low:
-            self.state = State.ACTING
-            return -self.k - self.kac
-        return -self.k
+        if self.crossed(Tr, self.state, t):
+            self.state = State.STOP if self.state == State.ACTING else State.ACTING
+        return self.rhs_y(t, Tr, self.state)
 
-    def reset_timer(self):
-        self.period_clock = -1
-        self.period = -1
-        self.last_start_moment = 0
-        self.action_time = 0
 
-    def get_period(self):
-        return self.period
+class Thermostat(Controller):
+    def __init__(self, airConditioner, Tr, t=0):
+        """
+        Switching and metrics bookkeeping for one run of a shared, untouched AirConditioner.
+        Pass flow to an integrator of methods and commit as its on_step.
 
-    def get_action_time(self):
-        return self.action_time
+        :param airConditioner: AirConditioner
+        :param Tr: initial room temperature - float
+        :param t: initial time - float
+        """
+        self.airConditioner = airConditioner
+        self.model = airConditioner
+        self.state = airConditioner.initial_state(Tr, t)
+        self.reset_timer()
@@ -0,0 +1,134 @@
+import numpy
+
+from air_conditioner import Mode
+from methods import taylor2, rkf
+from schedule import Schedule, at
+
+
+class AirConditionerBatch:
+    def __init__(self, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode):
+        """
+        Every parameter is either a scalar shared by all rooms or an array with one entry per room.
+        Temperatures may also be a Schedule, of one column shared by all rooms or of one column per room.
+
+        :param Tr: room temperatures - array
+        :param Tac: coils' temperatures - array or Schedule
+        :param Tout: outside air temperatures - array or Schedule
+        :param k, kac: cooling coefficients - array
+        :param Tc_low, Tc_high: control temperatures - array or Schedule
+        :param mode: Mode or sequence of Mode
+        """
+        params = Tr, Tac, Tout, k, kac, Tc_low, Tc_high
+        values = numpy.broadcast_arrays(*(numpy.asarray(at(p, 0), dtype=float) for p in params))
+        Tr, Tac, Tout, k, kac, Tc_low, Tc_high = (p if isinstance(p, Schedule) else v for p, v in zip(params, values))
+        if isinstance(mode, Mode):
+            cool = numpy.full(Tr.shape, mode == Mode.COOL)
+        else:
+            cool = numpy.broadcast_to(numpy.array([m == Mode.COOL for m in mode]), Tr.shape)
+        if numpy.any(k < 0) or numpy.any(kac < 0):
+            print("Please check cooling coefficients' coherence.")
+            return
+        if numpy.any(values[5] > values[6]):
+            print("Please check control temperature coherence.")
+            return
+        self.Tr = Tr.copy()
+        self.Tac = Tac
+        self.Tout = Tout
+        self.k = k
+        self.kac = kac
+        self.Tc_low = Tc_low
+        self.Tc_high = Tc_high
+        self.cool = cool
+        self.acting = numpy.where(cool, Tr > values[5], Tr < values[6])
+        self.reset_timer()
+
+    def act(self, t, Tr):
+        """
+        Vectorized counterpart of AirConditioner.act, the hysteresis state of each room being a boolean mask.
+
+        :param t: time - float
+        :param Tr: room temperatures - array
+        :return: dTr/dt - array
+        """
+        self.commit(t, Tr)
+        return self.flow(t, Tr)
+
+    def flow(self, t, Tr):
+        """
+        Right-hand side for the current masks, without any switching.
+
+        :param t: time - float
+        :param Tr: room temperatures - array
+        :return: dTr/dt - array
+        """
+        return self.k * (at(self.Tout, t) - Tr) + numpy.where(self.acting, self.kac * (at(self.Tac, t) - Tr), 0)
+
+    def commit(self, t, Tr):
+        """
+        Vectorized Thermostat.commit: switches the rooms whose temperature crossed a control temperature.
+
+        :param t: time - float
+        :param Tr: room temperatures - array
+        :return: whether any room switched - bool
+        """
+        Tc_low, Tc_high = at(self.Tc_low, t), at(self.Tc_high, t)
+        stop = self.acting & numpy.where(self.cool, Tr <= Tc_low, Tr >= Tc_high)
+        start = ~self.acting & numpy.where(self.cool, Tr > Tc_high, Tr < Tc_low)
+        if stop.any():
+            self.action_time = numpy.where(stop, self.action_time + t - self.last_start_moment, self.action_time)
+            open_period = stop & (self.period == -1)
+            self.period = numpy.where(open_period & (self.period_clock != -1), t - self.period_clock, self.period)
+            self.period_clock = numpy.where(open_period & (self.period_clock == -1), t, self.period_clock)
+        if start.any():
+            self.last_start_moment = numpy.where(start, t, self.last_start_moment)
+        self.acting = (self.acting & ~stop) | start
+        return bool(stop.any() or start.any())
+
+    def act_t(self, t, Tr):
+        """
+        :param t: time - float
+        :param Tr: room temperatures - array
+        :return: 0
+        """
+        return numpy.zeros_like(Tr)
+
+    def act_y(self, t, Tr):
+        """
+        Uses the state left by the preceding call to act at the same point.
+
+        :param t: time - float
+        :param Tr: room temperatures - array
+        :return: d(dTr/dt)/dTr - array
+        """
+        return -self.k - numpy.where(self.acting, self.kac, 0)
+
+    def reset_timer(self):
+        self.period_clock = numpy.full(self.Tr.shape, -1.0)
+        self.period = numpy.full(self.Tr.shape, -1.0)
+        self.last_start_moment = numpy.zeros(self.Tr.shape)
+        self.action_time = numpy.zeros(self.Tr.shape)
+
+    def get_period(self):
+        return self.period
+
+    def get_action_time(self):
+        return self.action_time
+
+
+def simulate(method, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, tf, n):
+    """
+    Steps all rooms at once with one of the fixed-step integrators of methods.
+
+    :param method: euler, taylor2, trapezium, mean, rk4 or pc
+    :param tf: time extension for analysis - float
+    :param n: step number - int
+    :return: t - (n + 1) array, T - (n + 1, rooms) array, period - array, action time - array
+    """
+    if method is rkf:
+        raise ValueError("rkf adapts its step per room and cannot be batched")
+    batch = AirConditionerBatch(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode)
+    if method is taylor2:
+        t, T = taylor2(batch.act, batch.act_t, batch.act_y, 0, tf, n, batch.Tr)
+    else:
+        t, T = method(batch.act, 0, tf, n, batch.Tr)
+    return t, T, batch.get_period(), batch.get_action_time()
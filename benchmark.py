@@ -0,0 +1,344 @@
+import argparse
+import csv
+import itertools
+import json
+from time import perf_counter
+import tracemalloc
+
+import numpy
+
+from air_conditioner import AirConditioner, Mode, Thermostat
+from methods import euler, taylor2, trapezium, mean, rk4, rkf, pc, backward_euler, crank_nicolson, bdf2, dopri, \
+    abm, Counter
+from exact import segments, evaluate
+
+Tac = {Mode.HEAT: 35, Mode.COOL: 5}  # The temperature of the coils
+Tout = {Mode.HEAT: 15, Mode.COOL: 35}  # The temperature of the outside air
+k = 0.03  # cooling coefficient(wall)
+kac = 0.1  # cooling coefficient(coils)
+Tc_low = 22  # control temperature(low)
+Tc_high = 24  # control temperature(high)
+Tr = {Mode.HEAT: 18, Mode.COOL: 30}  # initial room temperature
+
+fixed_step = {'euler': euler, 'taylor2': taylor2, 'trapezium': trapezium, 'mean': mean, 'rk4': rk4, 'pc': pc}
+implicit = {'backward_euler': backward_euler, 'crank_nicolson': crank_nicolson, 'bdf2': bdf2}
+adaptive = {'rkf': rkf, 'dopri': dopri, 'abm': abm}
+fields = ['method', 'mode', 'tf', 'n', 'tol', 'Kmax', 'Kmin', 'steps', 'rhs_calls', 'time_ms', 'peak_kb',
+          'max_error', 'period_error', 'action_time_error', 'jacobian_calls', 'rms_error']
+errors = ['max_error', 'rms_error', 'period_error', 'action_time_error']
+costs = ['steps', 'rhs_calls', 'jacobian_calls', 'time_ms']
+
+
+def parameters(mode, **config):
+    """
+    :param config: AirConditioner parameters differing from those of the benchmark, e.g. kac=10
+    :return: parameters of AirConditioner - dict
+    """
+    p = {'Tr': Tr[mode], 'Tac': Tac[mode], 'Tout': Tout[mode], 'k': k, 'kac': kac, 'Tc_low': Tc_low,
+         'Tc_high': Tc_high}
+    p.update(config)
+    return p
+
+
+def build(mode, p):
+    return AirConditioner(p['Tr'], p['Tac'], p['Tout'], p['k'], p['kac'], p['Tc_low'], p['Tc_high'], mode)
+
+
+def integrate(method, mode, tf, n, tol, Kmax, Kmin, **config):
+    """
+    :return: t - array, w - array, thermostat - Thermostat, rhs calls - int, Jacobian calls - int
+    """
+    p = parameters(mode, **config)
+    thermostat = Thermostat(build(mode, p), p['Tr'])
+    f = Counter(thermostat.flow)
+    ft = Counter(thermostat.flow_t)
+    fy = Counter(thermostat.flow_y)
+    if method == 'rkf':
+        t, w = rkf(f, 0, tf, p['Tr'], tol, Kmax, Kmin, on_step=thermostat.commit)
+    elif method in adaptive:
+        t, w = adaptive[method](f, 0, tf, p['Tr'], tol, Kmax, Kmin, on_step=thermostat.commit,
+                                g=thermostat.switch_distance)
+    elif method == 'taylor2':
+        t, w = taylor2(f, ft, fy, 0, tf, n, p['Tr'], thermostat.commit)
+    elif method in implicit:
+        t, w = implicit[method](f, fy, 0, tf, n, p['Tr'], thermostat.commit)
+    else:
+        t, w = fixed_step[method](f, 0, tf, n, p['Tr'], thermostat.commit)
+    return t, w, thermostat, f.calls, ft.calls + fy.calls
+
+
+def rms(t, e):
+    """
+    :return: root mean square of e over time, trapezoidal on the possibly non-uniform grid t - float
+    """
+    if len(t) < 2 or t[-1] == t[0]:
+        return float(numpy.abs(e).max())
+    return float(numpy.sqrt(numpy.sum((e[1:] ** 2 + e[:-1] ** 2) / 2 * numpy.diff(t)) / (t[-1] - t[0])))
+
+
+def difference(value, reference):
+    """
+    Error on a period or an action time; get_period returns -1 when there was no complete cycle, so the error
+    is nan when neither run has one and infinite when only one of them has.
+    """
+    if value == -1 or reference == -1:
+        return numpy.nan if value == reference else numpy.inf
+    return abs(value - reference)
+
+
+def measure(method, mode, tf, n=None, tol=None, Kmax=None, Kmin=None, **config):
+    """
+    Runs one integrator and compares it with the exact solution on the integrator's own grid. Peak memory comes
+    from a second, traced run so that tracemalloc does not inflate the timing. A run stopped by Kmin before tf,
+    or that blew up, gets infinite errors.
+
+    :param config: AirConditioner parameters differing from those of the benchmark, e.g. kac=10 for a stiff room
+    :return: one row of fields - dict
+    """
+    start = perf_counter()
+    t, w, thermostat, calls, jacobian_calls = integrate(method, mode, tf, n, tol, Kmax, Kmin, **config)
+    end = perf_counter()
+    tracemalloc.start()
+    integrate(method, mode, tf, n, tol, Kmax, Kmin, **config)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p = parameters(mode, **config)
+    reference = build(mode, p)
+    truth = evaluate(reference, segments(reference, 0, tf, p['Tr']), t)
+    e = numpy.abs(w - truth)
+    row = {
+        'method': method, 'mode': mode.name, 'tf': tf, 'n': n, 'tol': tol, 'Kmax': Kmax, 'Kmin': Kmin,
+        'steps': len(t) - 1,
+        'rhs_calls': calls,
+        'jacobian_calls': jacobian_calls,
+        'time_ms': (end - start) * 1000,
+        'peak_kb': peak / 1024,
+        'max_error': float(e.max()),
+        'rms_error': rms(t, e),
+        'period_error': difference(thermostat.get_period(), reference.get_period()),
+        'action_time_error': difference(thermostat.get_action_time(), reference.get_action_time()),
+    }
+    if t[-1] < tf - 1e-9 * max(1, abs(tf)) or not numpy.all(numpy.isfinite(e)):
+        row.update(dict.fromkeys(errors, numpy.inf))
+    return row
+
+
+def suite(ns=(100, 1000, 10000), tfs=(100, 1000), tols=(0.1, 0.01, 0.001), Kmaxs=(0.1, 1), Kmins=(0.0001,)):
+    """
+    :return: rows of every integrator over the grids, for both modes - list
+    """
+    rows = []
+    for mode, tf in itertools.product(Mode, tfs):
+        for method, n in itertools.product(itertools.chain(fixed_step, implicit), ns):
+            rows.append(measure(method, mode, tf, n=n))
+        for tol, Kmax, Kmin in itertools.product(tols, Kmaxs, Kmins):
+            rows.append(measure('rkf', mode, tf, tol=tol, Kmax=Kmax, Kmin=Kmin))
+    return rows
+
+
+def stiffness(kacs=(1, 10), ns=(100, 300, 1000, 3000, 10000, 30000), tf=1000, mode=Mode.HEAT):
+    """
+    Work-precision of the explicit and implicit fixed-step methods as kac grows: once h * (k + kac) leaves the
+    stability region the explicit errors blow up, while the implicit ones keep shrinking with h.
+
+    :return: (kac, method, n, rhs calls, time in ms, max error, period error) per run - list
+    """
+    rows = []
+    for value, method, n in itertools.product(kacs, itertools.chain(fixed_step, implicit), ns):
+        with numpy.errstate(over='ignore', invalid='ignore'):
+            row = measure(method, mode, tf, n=n, kac=value)
+        rows.append((value, method, n, row['rhs_calls'], row['time_ms'], row['max_error'], row['period_error']))
+    return rows
+
+
+def work_precision(mode, tf, ns=(100, 300, 1000, 3000, 10000), tols=(1, 0.1, 0.01, 0.001, 0.0001), Kmax=1,
+                   Kmin=0.0001, methods=None, **config):
+    """
+    Work-precision data of one configuration: every fixed-step method over ns and every adaptive one over tols.
+
+    :param methods: names to run, all of fixed_step, implicit and adaptive if None - sequence of str
+    :param config: as in measure
+    :return: rows of measure - list
+    """
+    if methods is None:
+        methods = list(itertools.chain(fixed_step, implicit, adaptive))
+    rows = []
+    with numpy.errstate(over='ignore', invalid='ignore'):
+        for method in methods:
+            if method in adaptive:
+                rows.extend(measure(method, mode, tf, tol=tol, Kmax=Kmax, Kmin=Kmin, **config) for tol in tols)
+            else:
+                rows.extend(measure(method, mode, tf, n=n, **config) for n in ns)
+    return rows
+
+
+def frontier(rows, error='max_error', cost='time_ms'):
+    """
+    Work-precision curve of each method: its runs by increasing cost, those no cheaper run beats in error
+    being dropped.
+
+    :return: method -> (cost, error) pairs - dict of list
+    """
+    curves = {}
+    for row in sorted(rows, key=lambda row: row[cost]):
+        curve = curves.setdefault(row['method'], [])
+        if not curve or row[error] < curve[-1][1]:
+            curve.append((row[cost], row[error]))
+    return curves
+
+
+def cheapest(rows, budget, cost='time_ms'):
+    """
+    :param budget: name of errors -> largest acceptable value - dict
+    :param cost: name of costs - str
+    :return: the cheapest row meeting every bound of budget, None if none does - dict
+    """
+    if not set(budget) <= set(errors) or cost not in costs:
+        raise ValueError("budget must bound some of %s and cost be one of %s" % (errors, costs))
+    meeting = [row for row in rows if all(row[name] <= bound for name, bound in budget.items())]
+    return min(meeting, key=lambda row: row[cost], default=None)
+
+
+def choose(mode, tf, budget, cost='time_ms', **options):
+    """
+    Picks the cheapest method meeting budget for one configuration.
+
+    :param options: further arguments of work_precision, configuration included
+    :return: chosen row or None, every row - tuple
+    """
+    rows = work_precision(mode, tf, **options)
+    return cheapest(rows, budget, cost), rows
+
+
+def rkf_scaling(horizons=(1000, 2000, 4000, 8000, 16000, 32000), tol=0.1, Kmax=0.1, Kmin=0.01):
+    """
+    Times rkf over growing horizons; the time per accepted step should stay constant.
+
+    :return: (tf, accepted, rejected, elapsed time in ms) per horizon - list
+    """
+    rows = []
+    for tf in horizons:
+        airConditioner = AirConditioner(Tr[Mode.HEAT], Tac[Mode.HEAT], Tout[Mode.HEAT], k, kac, Tc_low, Tc_high, Mode.HEAT)
+        stats = {}
+        start = perf_counter()
+        rkf(airConditioner.act, 0, tf, Tr[Mode.HEAT], tol, Kmax, Kmin, stats)
+        end = perf_counter()
+        rows.append((tf, stats['accepted'], stats['rejected'], (end - start) * 1000))
+    return rows
+
+
+def save(rows, path):
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, 'w') as file:
+            json.dump(rows, file, indent=1)
+
+
+def load(path):
+    if path.endswith('.csv'):
+        with open(path, newline='') as file:
+            return [{key: value if key in ('method', 'mode') else (float(value) if value else None)
+                     for key, value in row.items()} for row in csv.DictReader(file)]
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(old, new, threshold=1.2, min_time_ms=1):
+    """
+    :param old, new: rows of two runs of suite - list
+    :param threshold: slowdown or error growth ratio flagged as a regression - float
+    :param min_time_ms: timings below it are considered noise - float
+    :return: (row key, metric, old value, new value) of every regression - list
+    """
+    def key(row):
+        return tuple(row[field] if row[field] is None or isinstance(row[field], str) else float(row[field])
+                     for field in fields[:7])
+
+    before = {key(row): row for row in old}
+    regressions = []
+    for row in new:
+        if key(row) not in before:
+            continue
+        previous = before[key(row)]
+        if row['time_ms'] > threshold * max(previous['time_ms'], min_time_ms):
+            regressions.append((key(row), 'time_ms', previous['time_ms'], row['time_ms']))
+        for metric in ('rhs_calls', 'max_error', 'period_error', 'action_time_error'):
+            if row[metric] > threshold * previous[metric] + 1e-12:
+                regressions.append((key(row), metric, previous[metric], row[metric]))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless benchmark of the integrators of methods")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the suite and save it as .json or .csv")
+    run_parser.add_argument('output')
+    run_parser.add_argument('--n', type=int, nargs='+', default=[100, 1000, 10000])
+    run_parser.add_argument('--tf', type=float, nargs='+', default=[100, 1000])
+    run_parser.add_argument('--tol', type=float, nargs='+', default=[0.1, 0.01, 0.001])
+    run_parser.add_argument('--Kmax', type=float, nargs='+', default=[0.1, 1])
+    run_parser.add_argument('--Kmin', type=float, nargs='+', default=[0.0001])
+    compare_parser = commands.add_parser('compare', help="flag regressions between two saved runs")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=1.2)
+    commands.add_parser('rkf', help="show that rkf scales linearly with the accepted steps")
+    stiff_parser = commands.add_parser('stiff', help="work-precision of explicit and implicit methods for large kac")
+    stiff_parser.add_argument('--kac', type=float, nargs='+', default=[1, 10])
+    stiff_parser.add_argument('--n', type=int, nargs='+', default=[100, 300, 1000, 3000, 10000, 30000])
+    stiff_parser.add_argument('--tf', type=float, default=1000)
+    choose_parser = commands.add_parser('choose', help="work-precision of every method for one configuration "
+                                                       "and the cheapest one meeting an error budget")
+    choose_parser.add_argument('--mode', choices=[mode.name for mode in Mode], default='HEAT')
+    choose_parser.add_argument('--set', nargs='*', default=[], metavar='NAME=VALUE',
+                               help="AirConditioner parameters differing from the benchmark's, e.g. kac=1")
+    choose_parser.add_argument('--tf', type=float, default=1000)
+    choose_parser.add_argument('--n', type=int, nargs='+', default=[100, 300, 1000, 3000, 10000])
+    choose_parser.add_argument('--tol', type=float, nargs='+', default=[1, 0.1, 0.01, 0.001, 0.0001])
+    choose_parser.add_argument('--Kmax', type=float, default=1)
+    choose_parser.add_argument('--Kmin', type=float, default=0.0001)
+    choose_parser.add_argument('--methods', nargs='+')
+    choose_parser.add_argument('--budget', nargs='*', default=['max_error=0.1'], metavar='ERROR=BOUND')
+    choose_parser.add_argument('--cost', choices=costs, default='time_ms')
+    choose_parser.add_argument('--output', help="save every row as .json or .csv")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        save(suite(args.n, args.tf, args.tol, args.Kmax, args.Kmin), args.output)
+    elif args.command == 'compare':
+        regressions = compare(load(args.old), load(args.new), args.threshold)
+        for row, metric, old, new in regressions:
+            print(f"{row}: {metric} {old:.6g} -> {new:.6g}")
+        raise SystemExit(1 if regressions else 0)
+    elif args.command == 'stiff':
+        print(f"{'kac':>6} {'method':>15} {'n':>7} {'rhs calls':>10} {'time (ms)':>10} {'max error':>10} {'period err':>10}")
+        for value, method, n, calls, elapsed, error, period_error in stiffness(args.kac, args.n, args.tf):
+            print(f"{value:>6g} {method:>15} {n:>7} {calls:>10} {elapsed:>10.1f} {error:>10.3g} "
+                  f"{period_error:>10.3g}")
+    elif args.command == 'choose':
+        config = {name: float(value) for name, value in (item.split('=') for item in args.set)}
+        budget = {name: float(bound) for name, bound in (item.split('=') for item in args.budget)}
+        chosen, rows = choose(Mode[args.mode], args.tf, budget, args.cost, ns=args.n, tols=args.tol,
+                              Kmax=args.Kmax, Kmin=args.Kmin, methods=args.methods, **config)
+        print(f"{'method':>15} {'n':>6} {'tol':>7} {'rhs calls':>10} {'time (ms)':>10} {'max error':>10} "
+              f"{'rms error':>10} {'period err':>10} {'action err':>10}")
+        for row in rows:
+            print(f"{row['method']:>15} {row['n'] or '':>6} {row['tol'] or '':>7} {row['rhs_calls']:>10} "
+                  f"{row['time_ms']:>10.1f} {row['max_error']:>10.3g} {row['rms_error']:>10.3g} "
+                  f"{row['period_error']:>10.3g} {row['action_time_error']:>10.3g}")
+        if args.output:
+            save(rows, args.output)
+        if chosen is None:
+            print(f"no run meets {budget}")
+            raise SystemExit(1)
+        print(f"cheapest by {args.cost} meeting {budget}: {chosen['method']} n={chosen['n']} tol={chosen['tol']} "
+              f"({chosen[args.cost]:.6g})")
+    else:
+        print(f"{'tf':>8} {'accepted':>10} {'rejected':>10} {'time (ms)':>12} {'us/step':>8}")
+        for tf, accepted, rejected, elapsed in rkf_scaling():
+            print(f"{tf:>8} {accepted:>10} {rejected:>10} {elapsed:>12.1f} {1000 * elapsed / accepted:>8.2f}")
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+import hashlib
+import os
+
+import numpy
+
+
+class ResultCache:
+    def __init__(self, maxsize=64, max_bytes=256 * 2 ** 20, directory=None):
+        """
+        Least recently used cache of simulation results, i.e. tuples of arrays, floats and dicts of floats
+        such as the metrics totals.
+
+        :param maxsize: maximum number of entries kept in memory - int
+        :param max_bytes: maximum memory held by the cached arrays - int
+        :param directory: if given, results are also stored there as .npz and reloaded across sessions - str
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.npz')
+
+    def get(self, key):
+        """
+        :param key: simulation parameters - tuple
+        :return: cached result, None on a miss
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.directory is None or not os.path.exists(self.path(key)):
+            return None
+        with numpy.load(self.path(key)) as data:
+            value = tuple(entry(data, i) for i in range(len({name.split('_')[1] for name in data.files})))
+        self.store(key, value)
+        return value
+
+    def put(self, key, value):
+        """
+        :param key: simulation parameters - tuple
+        :param value: result - tuple
+        """
+        self.store(key, value)
+        if self.directory is not None:
+            entries = {}
+            for i, v in enumerate(value):
+                if isinstance(v, dict):
+                    entries[f'keys_{i}'] = numpy.array(list(v), dtype=str)
+                    entries[f'values_{i}'] = numpy.array(list(v.values()), dtype=float)
+                else:
+                    entries[f'arr_{i}'] = v
+            numpy.savez(self.path(key), **entries)
+
+    def store(self, key, value):
+        if key in self.entries:
+            self.nbytes -= size(self.entries.pop(key))
+        self.entries[key] = value
+        self.nbytes += size(value)
+        while len(self.entries) > 1 and (len(self.entries) > self.maxsize or self.nbytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= size(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+def size(value):
+    return sum(numpy.asarray(v).nbytes for v in value)
+
+
+def entry(data, i):
+    """
+    Item i of a result saved by put, a dict being saved as its keys and its float values so that it loads
+    without pickle.
+    """
+    if f'arr_{i}' in data.files:
+        v = data[f'arr_{i}']
+        return v.item() if v.ndim == 0 else v
+    return dict(zip(data[f'keys_{i}'].tolist(), data[f'values_{i}'].tolist()))
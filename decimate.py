@@ -0,0 +1,93 @@
+import numpy
+
+
+def minmax(t, w, x0, x1, bins):
+    """
+    Points of (t, w) to draw for the view x0..x1 at a resolution of bins columns: the visible points are cut in
+    bins runs of consecutive points, of which only the minimum and the maximum are kept, in time order, so
+    switching kinks and extrema survive whatever the length of the trajectory.
+
+    :param t: times, increasing - array
+    :param w: values - array
+    :param x0, x1: visible time range - float
+    :param bins: columns, e.g. the axes width in pixels - int
+    :return: t, w decimated - array
+    """
+    start = max(numpy.searchsorted(t, x0, side='right') - 1, 0)
+    stop = min(numpy.searchsorted(t, x1, side='left') + 1, len(t))
+    t, w = t[start:stop], w[start:stop]
+    count = len(t)
+    if count <= 4 * bins:
+        return t, w
+    size = -(-count // bins)
+    rows = numpy.pad(w, (0, size * bins - count), mode='edge').reshape(bins, size)
+    offsets = numpy.arange(bins) * size
+    lowest = offsets + numpy.argmin(rows, axis=1)
+    highest = offsets + numpy.argmax(rows, axis=1)
+    kept = numpy.empty(2 * bins + 2, dtype=int)
+    kept[0], kept[-1] = 0, count - 1
+    kept[1:-1:2] = numpy.minimum(lowest, highest)
+    kept[2:-1:2] = numpy.maximum(lowest, highest)
+    kept = numpy.unique(numpy.minimum(kept, count - 1))
+    return t[kept], w[kept]
+
+
+class Traces:
+    def __init__(self, ax):
+        """
+        One persistent Line2D per named trajectory on ax, holding the decimation of the full trajectory for the
+        current view; zooming, panning or resizing re-decimates instead of drawing every point.
+
+        :param ax: matplotlib Axes
+        """
+        self.ax = ax
+        self.data = {}
+        self.lines = {}
+        self.changed = False
+        ax.callbacks.connect('xlim_changed', self.refresh)
+        ax.figure.canvas.mpl_connect('resize_event', self.refresh)
+
+    def set(self, name, t, w, label):
+        """
+        Creates or updates the line of name; nothing is recomputed if t and w are the arrays it already holds.
+        """
+        line = self.lines.get(name)
+        if line is None:
+            line, = self.ax.plot([], [])
+            self.lines[name] = line
+        line.set_label(label)
+        if name in self.data and self.data[name][0] is t and self.data[name][1] is w:
+            return
+        self.data[name] = t, w
+        self.changed = True
+        self.decimate(name)
+
+    def show(self, name, visible):
+        if name in self.lines:
+            self.lines[name].set_visible(visible)
+
+    def visible(self):
+        return [line for line in self.lines.values() if line.get_visible()]
+
+    def decimate(self, name):
+        x0, x1 = self.ax.get_xlim()
+        t, w = self.data[name]
+        self.lines[name].set_data(*minmax(t, w, x0, x1, max(int(self.ax.bbox.width), 1)))
+
+    def refresh(self, *args):
+        for name in self.data:
+            self.decimate(name)
+
+    def fit(self):
+        """
+        Resets the view to the whole of the visible trajectories once new data arrived.
+        """
+        if not self.changed:
+            return
+        self.changed = False
+        shown = [self.data[name] for name, line in self.lines.items() if line.get_visible() and name in self.data]
+        if not shown:
+            return
+        self.ax.set_xlim(min(t[0] for t, _ in shown), max(t[-1] for t, _ in shown))
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view(scalex=False)
@@ -0,0 +1,88 @@
+import numpy
+
+from air_conditioner import Mode, defaults
+from batch import AirConditionerBatch
+from metrics import Metrics
+import stream
+
+
+def sample(distributions, size, seed=None):
+    """
+    Draws every uncertain parameter independently, in name order so that a seed always gives the same draws.
+
+    :param distributions: parameter name -> constant, ('normal', mean, sd), ('lognormal', mean, sigma) of the
+                          underlying normal, ('uniform', low, high), ('triangular', low, mode, high)
+                          or callable(rng, size) - dict
+    :param size: number of members - int
+    :param seed: int
+    :return: parameter name -> draws - dict of array
+    """
+    rng = numpy.random.default_rng(seed)
+    draws = {}
+    for name in sorted(distributions):
+        spec = distributions[name]
+        if callable(spec):
+            draws[name] = numpy.asarray(spec(rng, size), dtype=float)
+        elif isinstance(spec, (tuple, list)):
+            draws[name] = getattr(rng, spec[0])(*spec[1:], size)
+        else:
+            draws[name] = numpy.full(size, float(spec))
+    return draws
+
+
+class Bands:
+    def __init__(self, percentiles=(5, 50, 95)):
+        """
+        Percentiles across members of every point of a streamed batch trajectory; only these are kept.
+
+        :param percentiles: sequence of float
+        """
+        self.percentiles = percentiles
+        self.t = []
+        self.bands = []
+
+    def update(self, t, w):
+        self.t.append(numpy.array(t))
+        self.bands.append(numpy.percentile(w, self.percentiles, axis=1).T)
+
+    def array(self):
+        """
+        :return: t - array, bands - (points, percentiles) array
+        """
+        return numpy.concatenate(self.t), numpy.concatenate(self.bands)
+
+
+def ensemble(distributions, size, method='rk4', tf=1000, n=10000, seed=None, percentiles=(5, 50, 95), bins=30,
+             chunk=256):
+    """
+    Monte Carlo over uncertain AirConditioner parameters: all members are stepped at once as one
+    AirConditionerBatch, streamed chunk by chunk into percentile bands, so memory does not grow with size * n.
+
+    :param distributions: as in sample, parameters left out take the values of air_conditioner.defaults - dict
+    :param method: 'euler', 'taylor2', 'trapezium', 'mean', 'rk4' or 'pc' - str
+    :param bins: histogram bins - int
+    :param chunk: points per streamed chunk - int
+    :return: t - array, bands - (n + 1, percentiles) array, histograms of period, action time and the totals
+             of metrics.Metrics as (counts, edges) over the members that completed them - dict,
+             per-member metrics - dict of array
+    """
+    draws = sample(distributions, size, seed)
+    p = dict(defaults, **draws)
+    mode = Mode[p['mode']] if isinstance(p['mode'], str) else p['mode']
+    if numpy.any(numpy.asarray(p['k']) < 0) or numpy.any(numpy.asarray(p['kac']) < 0):
+        raise ValueError("draws of k and kac must be nonnegative, e.g. lognormal or uniform")
+    batch = AirConditionerBatch(numpy.broadcast_to(p['Tr'], size), p['Tac'], p['Tout'], p['k'], p['kac'],
+                                p['Tc_low'], p['Tc_high'], mode)
+    meter = Metrics(batch, 0, batch.Tr)
+    if method == 'taylor2':
+        chunks = stream.taylor2(batch.flow, batch.act_t, batch.act_y, 0, tf, n, batch.Tr, chunk, meter.commit)
+    elif method == 'rkf':
+        raise ValueError("rkf adapts its step per member and cannot be batched")
+    else:
+        chunks = getattr(stream, method)(batch.flow, 0, tf, n, batch.Tr, chunk, meter.commit)
+    bands = Bands(percentiles)
+    stream.drain(chunks, reducers=(bands,))
+    metrics = {'period': numpy.where(batch.get_period() == -1, numpy.nan, batch.get_period()),
+               'action_time': batch.get_action_time(), **meter.summary()}
+    histograms = {name: numpy.histogram(values[numpy.isfinite(values)], bins) for name, values in metrics.items()}
+    return bands.array() + (histograms, metrics)
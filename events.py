@@ -0,0 +1,177 @@
+from functools import partial
+
+from methods import Buffer, euler_step, taylor2_step, trapezium_step, mean_step, rk4_step, rkf_step
+
+
+def locate(step, f, g, t, w, h, xtol=1e-12, maxiter=100):
+    """
+    Finds the first time in (t, t + h] where g crosses zero along the step, with the Illinois method.
+
+    :param step: one-step method - callable(f, t, w, h)
+    :param g: event function, > 0 before the event - callable(t, w)
+    :param xtol: tolerance on the event time - float
+    :return: time elapsed from t until the event - float
+    """
+    lo, hi = 0, h
+    glo, ghi = g(t, w), g(t + h, step(f, t, w, h))
+    side = 0
+    for _ in range(maxiter):
+        if hi - lo <= xtol:
+            break
+        mid = (lo * ghi - hi * glo) / (ghi - glo)
+        if not lo < mid < hi:
+            mid = (lo + hi) / 2
+        gmid = g(t + mid, step(f, t, w, mid))
+        if gmid > 0:
+            lo, glo = mid, gmid
+            if side == -1:
+                ghi /= 2
+            side = -1
+        else:
+            hi, ghi = mid, gmid
+            if side == 1:
+                glo /= 2
+            side = 1
+    return hi
+
+
+def located(step, f, g, on_event, a, b, n, w0, xtol=1e-12):
+    """
+    Integrates on the uniform grid of methods, inserting the located event points into the output; an event
+    located on a grid node gives that node once.
+
+    :param step: euler_step, trapezium_step, mean_step, rk4_step or partial(taylor2_step, ft=..., fy=...)
+    :param f: right-hand side that never switches, e.g. AirConditioner.flow
+    :param g: event function, e.g. AirConditioner.switch_distance
+    :param on_event: called at each located event, e.g. AirConditioner.switch - callable(t, w)
+    :return: t - array, w - array
+    """
+    h = (b - a) / n
+    t = Buffer()
+    w = Buffer()
+    tt, ww = a, w0
+    t.append(tt)
+    w.append(ww)
+    if g(tt, ww) <= 0:
+        on_event(tt, ww)
+    for i in range(n):
+        target = a + (i + 1) * h
+        wn = step(f, tt, ww, target - tt)
+        while tt < target and g(target, wn) <= 0:
+            tau = locate(step, f, g, tt, ww, target - tt, xtol)
+            if tau < target - tt:
+                tt, ww = tt + tau, step(f, tt, ww, tau)
+            else:
+                tt, ww = target, wn
+            t.append(tt)
+            w.append(ww)
+            on_event(tt, ww)
+            wn = step(f, tt, ww, target - tt)
+        if tt < target:
+            tt, ww = target, wn
+            t.append(tt)
+            w.append(ww)
+    return t.array(), w.array()
+
+
+def euler(f, g, on_event, a, b, n, w0, xtol=1e-12):
+    return located(euler_step, f, g, on_event, a, b, n, w0, xtol)
+
+
+def taylor2(f, ft, fy, g, on_event, a, b, n, w0, xtol=1e-12):
+    return located(partial(taylor2_step, ft=ft, fy=fy), f, g, on_event, a, b, n, w0, xtol)
+
+
+def trapezium(f, g, on_event, a, b, n, w0, xtol=1e-12):
+    return located(trapezium_step, f, g, on_event, a, b, n, w0, xtol)
+
+
+def mean(f, g, on_event, a, b, n, w0, xtol=1e-12):
+    return located(mean_step, f, g, on_event, a, b, n, w0, xtol)
+
+
+def rk4(f, g, on_event, a, b, n, w0, xtol=1e-12):
+    return located(rk4_step, f, g, on_event, a, b, n, w0, xtol)
+
+
+def rkf(f, g, on_event, a, b, w0, tol, Kmax, Kmin, xtol=1e-12):
+    """
+    Same step control as methods.rkf; a step that crosses an event is cut at the located time.
+    """
+    t = Buffer()
+    w = Buffer()
+    tt, ww = a, w0
+    t.append(tt)
+    w.append(ww)
+    if g(tt, ww) <= 0:
+        on_event(tt, ww)
+    k = Kmax
+    flag = 1
+    while flag == 1:
+        wn, R = rkf_step(f, tt, ww, k)
+        if R <= tol:
+            if g(tt + k, wn) <= 0:
+                tau = locate(lambda f, t, w, h: rkf_step(f, t, w, h)[0], f, g, tt, ww, k, xtol)
+                tt, ww = tt + tau, rkf_step(f, tt, ww, tau)[0]
+                on_event(tt, ww)
+            else:
+                tt, ww = tt + k, wn
+            t.append(tt)
+            w.append(ww)
+        delta = 0.84 * (tol / R) ** (1 / 4) if R > 0 else 4
+        if delta <= 0.1:
+            k = 0.1 * k
+        elif delta >= 4:
+            k = 4 * k
+        else:
+            k = delta * k
+        if k > Kmax:
+            k = Kmax
+        if tt >= b:
+            flag = 0
+        if tt + k >= b:
+            k = b - tt
+        if k < Kmin:
+            flag = -1
+    return t.array(), w.array()
+
+
+def pc(f, g, on_event, a, b, n, w0, xtol=1e-12):
+    """
+    Adams-Bashforth-Moulton of methods.pc, restarted with RK4 after every event so that the
+    derivative history never mixes both states; the step after an event ends on the next grid node,
+    as in located.
+    """
+    h = (b - a) / n
+    t = Buffer()
+    w = Buffer()
+    tt, ww = a, w0
+    t.append(tt)
+    w.append(ww)
+    if g(tt, ww) <= 0:
+        on_event(tt, ww)
+    history = [f(tt, ww)]
+    for i in range(n):
+        target = a + (i + 1) * h
+        if len(history) < 4:
+            wn = rk4_step(f, tt, ww, target - tt)
+        else:
+            wp = ww + h * (55 * history[0] - 59 * history[1] + 37 * history[2] - 9 * history[3]) / 24
+            wn = ww + h * (9 * f(tt + h, wp) + 19 * history[0] - 5 * history[1] + history[2]) / 24
+        while tt < target and g(target, wn) <= 0:
+            tau = locate(rk4_step, f, g, tt, ww, target - tt, xtol)
+            if tau < target - tt:
+                tt, ww = tt + tau, rk4_step(f, tt, ww, tau)
+            else:
+                tt, ww = target, wn
+            t.append(tt)
+            w.append(ww)
+            on_event(tt, ww)
+            history = []
+            wn = rk4_step(f, tt, ww, target - tt)
+        if tt < target:
+            tt, ww = target, wn
+            t.append(tt)
+            w.append(ww)
+        history = [f(tt, ww)] + history[:3]
+    return t.array(), w.array()
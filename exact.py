@@ -0,0 +1,107 @@
+import math
+
+import numpy
+
+from air_conditioner import Mode, State
+from schedule import scheduled
+
+
+def equilibrium(airConditioner, state):
+    """
+    Between two switching events dTr/dt = -rate * (Tr - Teq).
+
+    :param airConditioner: AirConditioner
+    :param state: State
+    :return: rate - float, Teq - float
+    """
+    ac = airConditioner
+    if state == State.ACTING:
+        rate = ac.k + ac.kac
+        if rate == 0:
+            return 0, ac.Tout
+        return rate, (ac.k * ac.Tout + ac.kac * ac.Tac) / rate
+    return ac.k, ac.Tout
+
+
+def threshold(airConditioner, state):
+    """
+    :param airConditioner: AirConditioner
+    :param state: State
+    :return: control temperature at which the given state is left - float
+    """
+    ac = airConditioner
+    if (ac.mode == Mode.COOL) == (state == State.ACTING):
+        return ac.Tc_low
+    return ac.Tc_high
+
+
+def switch_time(airConditioner, Tr, state):
+    """
+    :param airConditioner: AirConditioner
+    :param Tr: room temperature - float
+    :param state: State
+    :return: time until the next switching event, None if it never happens - float
+    """
+    rate, Teq = equilibrium(airConditioner, state)
+    Ts = threshold(airConditioner, state)
+    if rate == 0 or Tr == Teq:
+        return None
+    ratio = (Ts - Teq) / (Tr - Teq)
+    if ratio <= 0 or ratio >= 1:
+        return None
+    return -math.log(ratio) / rate
+
+
+def segments(airConditioner, a, b, w0):
+    """
+    Jumps from switching event to switching event with the exponential solution of each linear piece.
+    The period and action time of airConditioner are updated exactly as AirConditioner.act would.
+
+    :param airConditioner: AirConditioner
+    :param a, b: time interval - float
+    :param w0: initial room temperature - float
+    :return: starting (t, Tr, state) of every segment - list
+    """
+    ac = airConditioner
+    if scheduled(ac.Tac, ac.Tout, ac.Tc_low, ac.Tc_high):
+        raise ValueError("the exponential solution needs constant temperatures")
+    t, Tr, state = a, w0, ac.state
+    segs = [(t, Tr, state)]
+    while True:
+        tau = switch_time(ac, Tr, state)
+        if tau is None or t + tau > b:
+            break
+        t = t + tau
+        Tr = threshold(ac, state)
+        ac.switch(t, Tr)
+        state = ac.state
+        segs.append((t, Tr, state))
+    return segs
+
+
+def evaluate(airConditioner, segs, t):
+    """
+    :param airConditioner: AirConditioner
+    :param segs: output of segments
+    :param t: times - array
+    :return: exact room temperatures at t - array
+    """
+    starts = numpy.array([s[0] for s in segs])
+    T0 = numpy.array([s[1] for s in segs])
+    rate, Teq = numpy.array([equilibrium(airConditioner, s[2]) for s in segs]).T
+    i = numpy.clip(numpy.searchsorted(starts, t, side='right') - 1, 0, len(segs) - 1)
+    return Teq[i] + (T0[i] - Teq[i]) * numpy.exp(-rate[i] * (t - starts[i]))
+
+
+def exact(airConditioner, a, b, n, w0):
+    """
+    Exact trajectory sampled on the same grid as the fixed-step integrators of methods.
+
+    :param airConditioner: AirConditioner
+    :param a, b: time interval - float
+    :param n: step number - int
+    :param w0: initial room temperature - float
+    :return: t - array, w - array
+    """
+    t = numpy.linspace(a, b, n + 1)
+    return t, evaluate(airConditioner, segments(airConditioner, a, b, w0), t)
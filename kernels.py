@@ -0,0 +1,350 @@
+import itertools
+
+import numpy
+
+from air_conditioner import Mode, State, Thermostat, crosses, toggle
+import methods
+from metrics import Metrics, below_scalar, totals
+from schedule import scheduled
+
+try:
+    from numba import njit
+    JIT = True
+except ImportError:
+    JIT = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+jit_steps = 50000  # steps from which a cold process runs the kernels rather than methods
+warmed = False
+
+# Compiled counterparts of the integrators of methods for the Thermostat model.
+# The right-hand side is thermostat_rhs(t, Tr, acting, p), p being the parameters array
+# (Tac, Tout, k, kac, Tc_low, Tc_high, cool) built by parameters(); it is called directly rather than passed in,
+# since a function argument makes every process compile the kernels again instead of loading them from the cache.
+# Switching is committed once per accepted step, exactly as Thermostat.commit does, and book holds
+# (period_clock, period, last_start_moment, action_time), then whether the air conditioner is acting once the
+# kernel returns, then the derivatives pc needs to carry on, most recent first, nan where not computed yet,
+# then the totals of metrics.Metrics (energy, cycles, outside, peak) and the last committed time and temperature
+# they are accumulated from.
+
+
+@njit(cache=True)
+def thermostat_rhs(t, Tr, acting, p):
+    if acting:
+        return p[2] * (p[1] - Tr) + p[3] * (p[0] - Tr)
+    return p[2] * (p[1] - Tr)
+
+
+@njit(cache=True)
+def thermostat_rhs_y(t, Tr, acting, p):
+    if acting:
+        return -p[2] - p[3]
+    return -p[2]
+
+
+below = njit(cache=True)(below_scalar)
+crosses = njit(cache=True)(crosses)
+toggle = njit(cache=True)(toggle)
+
+
+@njit(cache=True)
+def commit(t, Tr, acting, p, book):
+    dt = t - book[13]
+    if acting:
+        before = p[3] * abs(p[0] - book[14])
+        after = p[3] * abs(p[0] - Tr)
+        book[9] += (before + after) / 2 * dt
+        book[12] = max(book[12], before, after)
+    book[11] += (below(book[14], Tr, p[4]) + below(-book[14], -Tr, -p[5])) * dt
+    book[13] = t
+    book[14] = Tr
+    if not crosses(Tr, acting, p[6] != 0, p[4], p[5]):
+        return acting
+    acting = toggle(t, acting, book[:4])
+    if acting:
+        book[10] += 1
+    return acting
+
+
+@njit(cache=True)
+def euler_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    for i in range(n):
+        w[i + 1] = w[i] + h * thermostat_rhs(t[i], w[i], acting, p)
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def taylor2_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    for i in range(n):
+        s = thermostat_rhs(t[i], w[i], acting, p)
+        w[i + 1] = w[i] + h * s + h ** 2 / 2 * (0 + thermostat_rhs_y(t[i], w[i], acting, p) * s)
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def trapezium_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    for i in range(n):
+        s = thermostat_rhs(t[i], w[i], acting, p)
+        w[i + 1] = w[i] + h * (s + thermostat_rhs(t[i] + h, w[i] + h * s, acting, p)) / 2
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def mean_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    for i in range(n):
+        s = thermostat_rhs(t[i], w[i], acting, p)
+        w[i + 1] = w[i] + h * thermostat_rhs(t[i] + h / 2, w[i] + h * s / 2, acting, p)
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def rk4_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    for i in range(n):
+        s1 = thermostat_rhs(t[i], w[i], acting, p)
+        s2 = thermostat_rhs(t[i] + h / 2, w[i] + h / 2 * s1, acting, p)
+        s3 = thermostat_rhs(t[i] + h / 2, w[i] + h / 2 * s2, acting, p)
+        s4 = thermostat_rhs(t[i] + h, w[i] + h * s3, acting, p)
+        w[i + 1] = w[i] + h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def pc_kernel(t, w0, acting, p, book):
+    n = len(t) - 1
+    h = (t[n] - t[0]) / n
+    w = numpy.zeros(n + 1)
+    w[0] = w0
+    d = book[5:9]
+    for i in range(n):
+        f0 = thermostat_rhs(t[i], w[i], acting, p)
+        if numpy.isnan(d[3]):
+            s2 = thermostat_rhs(t[i] + h / 2, w[i] + h / 2 * f0, acting, p)
+            s3 = thermostat_rhs(t[i] + h / 2, w[i] + h / 2 * s2, acting, p)
+            s4 = thermostat_rhs(t[i] + h, w[i] + h * s3, acting, p)
+            w[i + 1] = w[i] + h / 6 * (f0 + 2 * s2 + 2 * s3 + s4)
+            t[i + 1] = t[i] + h
+        else:
+            f1 = d[0]
+            f2 = d[1]
+            f3 = d[2]
+            w[i + 1] = w[i] + h * (55 * f0 - 59 * f1 + 37 * f2 - 9 * f3) / 24
+            t[i + 1] = t[i] + h
+            f4 = thermostat_rhs(t[i + 1], w[i + 1], acting, p)
+            w[i + 1] = w[i] + h * (9 * f4 + 19 * f0 - 5 * f1 + f2) / 24
+        d[3] = d[2]
+        d[2] = d[1]
+        d[1] = d[0]
+        d[0] = f0
+        acting = commit(t[i + 1], w[i + 1], acting, p, book)
+    book[4] = acting
+    return w
+
+
+@njit(cache=True)
+def rkf_kernel(a, b, w0, tol, Kmax, Kmin, acting, p, book):
+    t = numpy.empty(1024)
+    w = numpy.empty(1024)
+    t[0] = a
+    w[0] = w0
+    size = 1
+    k = Kmax
+    flag = 1
+    tt = a
+    ww = w0
+    while flag == 1:
+        F0 = k * thermostat_rhs(tt, ww, acting, p)
+        F1 = k * thermostat_rhs(tt + k / 4, ww + F0 / 4, acting, p)
+        F2 = k * thermostat_rhs(tt + 3 * k / 8, ww + 3 * F0 / 32 + 9 * F1 / 32, acting, p)
+        F3 = k * thermostat_rhs(tt + 12 * k / 13, ww + 1932 * F0 / 2197 - 7200 * F1 / 2197 + 7296 * F2 / 2197,
+                                acting, p)
+        F4 = k * thermostat_rhs(tt + k, ww + 439 * F0 / 216 - 8 * F1 + 3680 * F2 / 513 - 845 * F3 / 4104, acting, p)
+        F5 = k * thermostat_rhs(tt + k / 2, ww - 8 * F0 / 27 + 2 * F1 - 3544 * F2 / 2565 + 1859 * F3 / 4104
+                                - 11 * F4 / 40, acting, p)
+        R = abs(F0 / 360 - 128 * F2 / 4275 - 2197 * F3 / 75240 + F4 / 50 + 2 * F5 / 55) / k
+        if R <= tol:
+            tt = tt + k
+            ww = ww + 25 * F0 / 216 + 1408 * F2 / 2565 + 2197 * F3 / 4104 - F4 / 5
+        delta = 0.84 * (tol / R) ** (1 / 4) if R > 0 else 4
+        if delta <= 0.1:
+            k = 0.1 * k
+        elif delta >= 4:
+            k = 4 * k
+        else:
+            k = delta * k
+        if k > Kmax:
+            k = Kmax
+        if tt >= b:
+            flag = 0
+        if tt + k >= b:
+            k = b - tt
+        if k < Kmin:
+            flag = -1
+        if R <= tol:
+            if size == len(t):
+                t = numpy.concatenate((t, numpy.empty(size)))
+                w = numpy.concatenate((w, numpy.empty(size)))
+            t[size] = tt
+            w[size] = ww
+            size += 1
+            acting = commit(tt, ww, acting, p, book)
+    book[4] = acting
+    return t[:size].copy(), w[:size].copy()
+
+
+def parameters(airConditioner):
+    """
+    :param airConditioner: AirConditioner
+    :return: parameters array of the thermostat kernels
+    """
+    ac = airConditioner
+    if scheduled(ac.Tac, ac.Tout, ac.Tc_low, ac.Tc_high):
+        raise ValueError("the kernels take constant temperatures, schedules need the python backend")
+    return numpy.array([ac.Tac, ac.Tout, ac.k, ac.kac, ac.Tc_low, ac.Tc_high, ac.mode == Mode.COOL], dtype=float)
+
+
+def warm():
+    """
+    Compiles, or loads from the on-disk cache, every kernel at once, so that the first run timed afterwards
+    does not include it. Loading still takes a few hundred milliseconds per process.
+    """
+    global warmed
+    if warmed or not JIT:
+        return
+    t = numpy.linspace(0, 1, 3)
+    p = numpy.array([35, 15, 0.03, 0.1, 22, 24, 0], dtype=float)
+    for kernel in itertools.chain(kernels.values(), (taylor2_kernel,)):
+        kernel(t.copy(), 18.0, True, p, numpy.full(15, numpy.nan))
+    rkf_kernel(0.0, 1.0, 18.0, 0.1, 0.5, 0.01, True, p, numpy.full(15, numpy.nan))
+    warmed = True
+
+
+def backend_for(method, airConditioner, a, b, n, Kmax=0.1):
+    """
+    The compiled kernels once they are warm or when the run is long enough to pay for loading them, methods
+    otherwise; schedules always need methods.
+
+    :return: 'jit' or 'python'
+    """
+    ac = airConditioner
+    if not JIT or scheduled(ac.Tac, ac.Tout, ac.Tc_low, ac.Tc_high):
+        return 'python'
+    steps = (b - a) / Kmax if method == 'rkf' else n
+    return 'jit' if warmed or steps >= jit_steps else 'python'
+
+
+def start(airConditioner, a, w0):
+    """
+    :param airConditioner: AirConditioner
+    :param a: initial time - float
+    :param w0: initial room temperature - float
+    :return: checkpoint of a run about to begin, for resume - dict
+    """
+    return {'t': a, 'w': w0, 'thermostat': Thermostat(airConditioner, w0, a).save(), 'history': [],
+            'metrics': dict.fromkeys(totals, 0.0)}
+
+
+def solve(method, airConditioner, a, b, n, w0, tol=0.1, Kmax=0.1, Kmin=0.01, backend=None):
+    """
+    Runs one integrator on a fresh Thermostat of airConditioner, with the compiled kernels or with methods.
+
+    :param method: 'euler', 'taylor2', 'trapezium', 'mean', 'rk4', 'rkf' or 'pc'
+    :param backend: 'jit' or 'python', picked by backend_for if None
+    :return: t - array, w - array, period - float, action time - float
+    """
+    return resume(method, airConditioner, start(airConditioner, a, w0), b, n, tol, Kmax, Kmin, backend)[:4]
+
+
+def resume(method, airConditioner, checkpoint, b, n, tol=0.1, Kmax=0.1, Kmin=0.01, backend=None):
+    """
+    Carries a run on from a checkpoint to b. A fixed-step run resumed with the step size it had gives the
+    same points as a single run over the whole horizon; rkf starts over from Kmax.
+
+    :param checkpoint: final time, room temperature, thermostat state, pc derivatives and metrics totals of
+                       a previous run, as returned here or by start - dict
+    :param n: step number from the checkpoint to b - int
+    :return: t - array, w - array, period - float, action time - float, checkpoint at b - dict
+    """
+    if backend is None:
+        backend = backend_for(method, airConditioner, checkpoint['t'], b, n, Kmax)
+    a, w0 = checkpoint['t'], checkpoint['w']
+    thermostat = Thermostat(airConditioner, w0, a)
+    thermostat.restore(checkpoint['thermostat'])
+    history = list(checkpoint['history'])
+    if backend == 'python':
+        meter = Metrics(thermostat, a, w0, start=checkpoint['metrics'])
+        if method == 'taylor2':
+            t, w = methods.taylor2(thermostat.flow, thermostat.flow_t, thermostat.flow_y, a, b, n, w0, meter.commit)
+        elif method == 'rkf':
+            t, w = methods.rkf(thermostat.flow, a, b, w0, tol, Kmax, Kmin, on_step=meter.commit)
+        elif method == 'pc':
+            t, w = methods.pc(thermostat.flow, a, b, n, w0, meter.commit, history=history)
+        else:
+            t, w = getattr(methods, method)(thermostat.flow, a, b, n, w0, meter.commit)
+        summary = meter.summary()
+    else:
+        p = parameters(airConditioner)
+        state, period_clock, period, last_start_moment, action_time = thermostat.save()
+        book = numpy.full(15, numpy.nan)
+        book[:5] = period_clock, period, last_start_moment, action_time, state == State.ACTING
+        book[5:5 + len(history)] = history
+        book[9:13] = [checkpoint['metrics'][name] for name in totals]
+        book[13:] = a, w0
+        acting = state == State.ACTING
+        if method == 'rkf':
+            t, w = rkf_kernel(float(a), float(b), float(w0), tol, Kmax, Kmin, acting, p, book)
+        else:
+            t = numpy.linspace(a, b, n + 1)
+            if method == 'taylor2':
+                w = taylor2_kernel(t, float(w0), acting, p, book)
+            else:
+                w = kernels[method](t, float(w0), acting, p, book)
+        thermostat.restore((State.ACTING if book[4] else State.STOP, book[0], book[1], book[2], book[3]))
+        if method == 'pc':
+            history = [float(d) for d in book[5:9] if not numpy.isnan(d)]
+        summary = dict(zip(totals, book[9:13].tolist()))
+    end = {'t': t[-1], 'w': w[-1], 'thermostat': thermostat.save(), 'history': history if method == 'pc' else [],
+           'metrics': summary}
+    return t, w, thermostat.get_period(), thermostat.get_action_time(), end
+
+
+kernels = {
+    'euler': euler_kernel,
+    'trapezium': trapezium_kernel,
+    'mean': mean_kernel,
+    'rk4': rk4_kernel,
+    'pc': pc_kernel,
+}
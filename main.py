@@ -1,53 +1,169 @@
-from air_conditioner import AirConditioner, Mode
-from methods import euler, taylor2, trapezium, mean, rk4, rkf, pc
-import matplotlib.pyplot
-
-Tac = 35  # The temperature of the coils
-Tout = 15  # The temperature of the outside air
-k = 0.03  # cooling coefficient(wall)
-kac = 0.1  # cooling coefficient(coils)
-Tc_low = 22  # control temperature(low)
-Tc_high = 24  # control temperature(high)
-
-Tr = 18  # initial room temperature
-
-airConditioner = AirConditioner(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, Mode.HEAT)
-
-tf = 100  # time extension for analysis
-n = 500  # step number
-
-"Please use airConditioner.reset_timer() before you uncomment any one method"
-"The airConditioner.period() and airConditioner.action_time() will return the data from last method used"
-
-t, Teuler = euler(airConditioner.act, 0, tf, n, Tr)
-# airConditioner.reset_timer()
-# t, Ttaylor2 = taylor2(airConditioner.act, airConditioner.act_t, airConditioner.act_y, 0, tf, n, Tr)
-# airConditioner.reset_timer()
-# t, Ttrapezium = trapezium(airConditioner.act, 0, tf, n, Tr)
-# airConditioner.reset_timer()
-# t, Tmean = mean(airConditioner.act, 0, tf, n, Tr)
-airConditioner.reset_timer()
-t, Trk4 = rk4(airConditioner.act, 0, tf, n, Tr)
-# airConditioner.reset_timer()
-# trkf, Trkf = rkf(airConditioner.act, 0, tf, Tr, 0.1, 0.1, 0.01)
-airConditioner.reset_timer()
-t, Tpc = pc(airConditioner.act, 0, tf, n, Tr)
-
-print(f"period = {airConditioner.get_period()}\naction time = {airConditioner.get_action_time()}")
-
-matplotlib.pyplot.plot(t, Teuler, label="Euler")
-# matplotlib.pyplot.plot(t, Ttaylor2, label="Taylor2")
-# matplotlib.pyplot.plot(t, Ttrapezium, label="Trapezium")
-# matplotlib.pyplot.plot(t, Tmean, label="Mean")
-matplotlib.pyplot.plot(t, Trk4, label="Runge-Kutta4")
-# matplotlib.pyplot.plot(trkf, Trkf, label="Runge-Kutta-Fehlberg")
-matplotlib.pyplot.plot(t, Tpc, label="predictor-corrector")
-
-matplotlib.pyplot.grid()
-matplotlib.pyplot.title('Air conditioning a room')
-matplotlib.pyplot.xlabel('t')
-matplotlib.pyplot.ylabel('room temperature')
-matplotlib.pyplot.legend()
-
-matplotlib.pyplot.savefig('fig.eps')
-matplotlib.pyplot.show()
+from time import perf_counter
+
+started = perf_counter()
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import os
+
+import numpy
+
+import air_conditioner
+from air_conditioner import Mode
+
+defaults = dict(
+    air_conditioner.defaults,  # the reference room
+    tf=100,  # time extension for analysis
+    n=500,  # step number
+    tol=0.1,
+    Kmax=0.1,
+    Kmin=0.01,
+    methods='euler;rk4;pc',
+)
+summary_fields = ['scenario', 'method', 'period', 'action_time', 'elapsed_ms']
+
+
+def load_scenarios(path):
+    """
+    A JSON file holds a list of scenarios, or {"defaults": {...}, "scenarios": [...]}; a CSV file has one
+    scenario per row. Missing parameters take the values of defaults, methods are separated by ';'.
+
+    :param path: scenario file, None for a single default scenario - str
+    :return: scenarios - list of dict
+    """
+    base = dict(defaults)
+    if path is None:
+        rows = [{}]
+    elif path.endswith('.csv'):
+        with open(path, newline='') as file:
+            rows = [{key: value for key, value in row.items() if value != ''} for row in csv.DictReader(file)]
+    else:
+        with open(path) as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            base.update(data.get('defaults', {}))
+            data = data['scenarios']
+        rows = data
+    scenarios = []
+    for row in rows:
+        scenario = dict(base, **row)
+        for key in ('Tac', 'Tout', 'k', 'kac', 'Tc_low', 'Tc_high', 'Tr', 'tf', 'tol', 'Kmax', 'Kmin'):
+            scenario[key] = float(scenario[key])
+        scenario['n'] = int(scenario['n'])
+        if isinstance(scenario['methods'], str):
+            scenario['methods'] = scenario['methods'].split(';')
+        scenarios.append(scenario)
+    return scenarios
+
+
+def steps(scenario):
+    """
+    :return: largest step number of the runs of scenario, rkf taking tf / Kmax - float
+    """
+    s = scenario
+    return max(s['tf'] / s['Kmax'] if method == 'rkf' else s['n'] for method in s['methods'])
+
+
+def warm_worker(most_steps):
+    """
+    Pool initializer loading the compiled kernels when some run is long enough to use them.
+    """
+    from kernels import jit_steps, warm
+
+    if most_steps >= jit_steps:
+        warm()
+
+
+def run_scenario(index, scenario):
+    """
+    :return: index - int, method -> (t, T, period, action time, elapsed time in ms) - dict,
+             wall time in the worker in ms - float
+    """
+    from runs import run
+
+    start = perf_counter()
+    s = scenario
+    results = {method: run(method, s['Tr'], s['Tac'], s['Tout'], s['k'], s['kac'], s['Tc_low'], s['Tc_high'],
+                           Mode[s['mode']], s['tf'], s['n'], s['tol'], s['Kmin'], s['Kmax'])
+               for method in s['methods']}
+    return index, results, (perf_counter() - start) * 1000
+
+
+def write_trajectories(directory, index, results, fmt):
+    if fmt == 'npz':
+        arrays = {}
+        for method, (t, T, *_) in results.items():
+            arrays['t_' + method] = t
+            arrays['T_' + method] = T
+        numpy.savez(os.path.join(directory, f'scenario_{index}.npz'), **arrays)
+    elif fmt == 'csv':
+        with open(os.path.join(directory, f'scenario_{index}.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['method', 't', 'T'])
+            for method, (t, T, *_) in results.items():
+                writer.writerows((method, ti, Ti) for ti, Ti in zip(t, T))
+
+
+def plot(results, output, show):
+    import matplotlib.pyplot
+
+    for method, (t, T, *_) in results.items():
+        matplotlib.pyplot.plot(t, T, label=method)
+    matplotlib.pyplot.grid()
+    matplotlib.pyplot.title('Air conditioning a room')
+    matplotlib.pyplot.xlabel('t')
+    matplotlib.pyplot.ylabel('room temperature')
+    matplotlib.pyplot.legend()
+    matplotlib.pyplot.savefig(output)
+    if show:
+        matplotlib.pyplot.show()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless batch runner of air conditioner scenarios")
+    parser.add_argument('scenarios', nargs='?', help="JSON or CSV scenario file; the default scenario if omitted")
+    parser.add_argument('-o', '--output', default='results', help="output directory")
+    parser.add_argument('-f', '--format', choices=['npz', 'csv', 'none'], default='npz',
+                        help="format of the trajectories, the summary is always CSV")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="worker processes, 0 runs inline")
+    parser.add_argument('--plot', action='store_true', help="plot the first scenario to fig.eps")
+    parser.add_argument('--show', action='store_true', help="also open the plot window")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    os.makedirs(args.output, exist_ok=True)
+    startup = (perf_counter() - started) * 1000
+    overheads = []
+    begin = perf_counter()
+    with open(os.path.join(args.output, 'summary.csv'), 'w', newline='') as file:
+        summary = csv.DictWriter(file, fieldnames=summary_fields)
+        summary.writeheader()
+
+        def collect(index, results, wall):
+            for method, (t, T, period, action_time, elapsed) in results.items():
+                summary.writerow({'scenario': index, 'method': method, 'period': period,
+                                  'action_time': action_time, 'elapsed_ms': elapsed})
+            file.flush()
+            if args.format != 'none':
+                write_trajectories(args.output, index, results, args.format)
+            overheads.append(wall - sum(result[4] for result in results.values()))
+            if (args.plot or args.show) and index == 0:
+                plot(results, 'fig.eps', args.show)
+
+        if args.workers == 0:
+            for index, scenario in enumerate(scenarios):
+                collect(*run_scenario(index, scenario))
+        else:
+            most_steps = max(map(steps, scenarios), default=0)
+            with ProcessPoolExecutor(args.workers, initializer=warm_worker, initargs=(most_steps,)) as executor:
+                chunksize = max(1, len(scenarios) // (4 * args.workers))
+                for outcome in executor.map(run_scenario, range(len(scenarios)), scenarios, chunksize=chunksize):
+                    collect(*outcome)
+
+    total = (perf_counter() - begin) * 1000
+    # Time spent in the worker around the integrations, pickling and IPC being part of the total only
+    overhead = f"{numpy.mean(overheads):.3f} ms" if overheads else "n/a"
+    print(f"{len(scenarios)} scenarios, startup {startup:.1f} ms, total {total:.1f} ms, "
+          f"mean in-worker overhead per scenario {overhead}")
@@ -1,83 +1,295 @@
 import numpy
 
 
-def euler(f, a, b, n, w0):
+def euler_step(f, t, w, h):
+    return w + h * f(t, w)
+
+
+def taylor2_step(f, t, w, h, ft, fy):
+    s = f(t, w)
+    return w + h * s + h ** 2 / 2 * (ft(t, w) + product(fy(t, w), s))
+
+
+def product(J, s):
+    """
+    :param J: Jacobian, as its diagonal (float or array), a 2-D array or a scipy.sparse matrix
+    :return: J times s - float or array
+    """
+    if hasattr(J, 'tocsc') or numpy.ndim(J) == 2:
+        return J @ s
+    return J * s
+
+
+def trapezium_step(f, t, w, h):
+    s = f(t, w)
+    return w + h * (s + f(t + h, w + h * s)) / 2
+
+
+def mean_step(f, t, w, h):
+    return w + h * f(t + h / 2, w + h * f(t, w) / 2)
+
+
+def rk4_step(f, t, w, h):
+    s1 = f(t, w)
+    s2 = f(t + h / 2, w + h / 2 * s1)
+    s3 = f(t + h / 2, w + h / 2 * s2)
+    s4 = f(t + h, w + h * s3)
+    return w + h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
+
+
+def running(w0):
+    """
+    Copy of w0 in float64, that the fixed-step methods step on and only write into w, so that a float32 out
+    rounds what is stored and not the integration.
+    """
+    return numpy.array(w0, dtype=float) if numpy.ndim(w0) else numpy.float64(w0)
+
+
+def euler(f, a, b, n, w0, on_step=None, out=None):
+    """
+    All fixed-step methods share this interface.
+
+    :param on_step: called after every step - callable(t, w)
+    :param out: array of shape (n + 1,) + shape(w0), e.g. a numpy.memmap, written in place of a new w;
+                the steps themselves are taken in float64 whatever its dtype
+    """
+    t = numpy.linspace(a, b, n + 1)
+    h = (b - a) / n
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
+    for i in range(n):
+        ww = ww + h * f(t[i], ww)
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
+    return t, w
+
+
+def taylor2(f, ft, fy, a, b, n, w0, on_step=None, out=None):
+    """
+    :param fy: Jacobian, in any of the forms newton takes; coupled equations need it whole for the second
+               order - callable(t, w)
+    """
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
     for i in range(n):
-        w[i + 1] = w[i] + h * f(t[i], w[i])
+        s = f(t[i], ww)
+        ww = ww + h * s + h ** 2 / 2 * (ft(t[i], ww) + product(fy(t[i], ww), s))
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
 
 
-def taylor2(f, ft, fy, a, b, n, w0):
+def trapezium(f, a, b, n, w0, on_step=None, out=None):
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
     for i in range(n):
-        w[i + 1] = w[i] \
-                   + h * f(t[i], w[i]) \
-                   + h ** 2 / 2 * (ft(t[i], w[i]) + fy(t[i], w[i]) * f(t[i], w[i]))
+        s = f(t[i], ww)
+        ww = ww + h * (s + f(t[i] + h, ww + h * s)) / 2
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
 
 
-def trapezium(f, a, b, n, w0):
+def mean(f, a, b, n, w0, on_step=None, out=None):
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
     for i in range(n):
-        w[i + 1] = w[i]\
-            + h * (f(t[i], w[i]) + f(t[i] + h, w[i] + h * f(t[i], w[i]))) / 2
+        ww = ww + h * f(t[i] + h / 2, ww + h * f(t[i], ww) / 2)
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
 
 
-def mean(f, a, b, n, w0):
+def rk4(f, a, b, n, w0, on_step=None, out=None):
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
     for i in range(n):
-        w[i + 1] = w[i] + h * f(t[i] + h / 2, w[i] + h * f(t[i], w[i]) / 2)
+        s1 = f(t[i], ww)
+        s2 = f(t[i] + h / 2, ww + h / 2 * s1)
+        s3 = f(t[i] + h / 2, ww + h / 2 * s2)
+        s4 = f(t[i] + h, ww + h * s3)
+        ww = ww + h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
 
 
-def rk4(f, a, b, n, w0):
+def newton(f, fy, t, w, c, rhs, tol=1e-10, maxiter=20):
+    """
+    Solves v = rhs + c * f(t, v) by Newton iterations starting from w. The room models are linear in the
+    temperature, so one iteration is exact and the second only confirms it. A Jacobian given by its diagonal
+    alone, when the rooms are coupled, makes it a slower quasi-Newton iteration.
+
+    :param fy: Jacobian, as its diagonal (float or array), a 2-D array or a scipy.sparse matrix - callable(t, w)
+    :param c: h times the weight of the implicit slope - float
+    :return: v - float or array
+    """
+    v = w
+    for _ in range(maxiter):
+        r = v - rhs - c * f(t, v)
+        J = fy(t, v)
+        if hasattr(J, 'tocsc'):
+            from scipy import sparse
+            from scipy.sparse.linalg import spsolve
+
+            dv = spsolve(sparse.identity(len(r), format='csc') - c * J.tocsc(), r)
+        elif numpy.ndim(J) == 2:
+            dv = numpy.linalg.solve(numpy.identity(len(r)) - c * J, r)
+        else:
+            dv = r / (1 - c * J)
+        v = v - dv
+        if isinstance(dv, float):
+            if abs(dv) <= tol * (1 + abs(v)):
+                break
+        elif numpy.all(numpy.abs(dv) <= tol * (1 + numpy.abs(v))):
+            break
+    return v
+
+
+def backward_euler(f, fy, a, b, n, w0, on_step=None, out=None):
+    """
+    Implicit, L-stable: stays stable and free of oscillations whatever h * (k + kac).
+
+    :param fy: d(dw/dt)/dw, e.g. Thermostat.flow_y - callable(t, w)
+    """
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
     for i in range(n):
-        s1 = f(t[i], w[i])
-        s2 = f(t[i] + h / 2, w[i] + h / 2 * s1)
-        s3 = f(t[i] + h / 2, w[i] + h / 2 * s2)
-        s4 = f(t[i] + h, w[i] + h * s3)
-        w[i + 1] = w[i] + h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
+        ww = newton(f, fy, t[i + 1], ww, h, ww)
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
 
 
-def rkf(f, a, b, w0, tol, Kmax, Kmin):
-    w = numpy.array(w0)
-    t = numpy.array(a)
+def crank_nicolson(f, fy, a, b, n, w0, on_step=None, out=None):
+    """
+    Implicit trapezoidal rule, second order and A-stable; very stiff steps are damped slowly and may alternate
+    in sign, for which backward_euler and bdf2 are better suited.
+    """
+    t = numpy.linspace(a, b, n + 1)
+    h = (b - a) / n
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
+    for i in range(n):
+        ww = newton(f, fy, t[i + 1], ww, h / 2, ww + h / 2 * f(t[i], ww))
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
+    return t, w
+
+
+def bdf2(f, fy, a, b, n, w0, on_step=None, out=None):
+    """
+    Second order backward differentiation formula, L-stable, started by one backward Euler step.
+    """
+    t = numpy.linspace(a, b, n + 1)
+    h = (b - a) / n
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
+    for i in range(n):
+        if i == 0:
+            ww, previous = newton(f, fy, t[i + 1], ww, h, ww), ww
+        else:
+            ww, previous = newton(f, fy, t[i + 1], ww, 2 * h / 3, (4 * ww - previous) / 3), ww
+        w[i + 1] = ww
+        if on_step is not None:
+            on_step(t[i + 1], ww)
+    return t, w
+
+
+class Counter:
+    def __init__(self, f):
+        """
+        Wraps a right-hand side to count its evaluations.
+
+        :param f: callable(t, w)
+        """
+        self.f = f
+        self.calls = 0
+
+    def __call__(self, t, w):
+        self.calls += 1
+        return self.f(t, w)
+
+
+class Buffer:
+    def __init__(self, capacity=1024):
+        """
+        Growable output array whose capacity doubles when full, trimmed once by array().
+
+        :param capacity: initial capacity - int
+        """
+        self.capacity = capacity
+        self.data = None
+        self.size = 0
+
+    def append(self, value):
+        if self.data is None:
+            self.data = numpy.empty((self.capacity,) + numpy.shape(value))
+        if self.size == len(self.data):
+            data = numpy.empty((2 * len(self.data),) + self.data.shape[1:])
+            data[:self.size] = self.data
+            self.data = data
+        self.data[self.size] = value
+        self.size += 1
+
+    def array(self):
+        if self.data is None:
+            return numpy.empty(0)
+        return self.data[:self.size].copy()
+
+
+def rkf_step(f, t, w, k):
+    """
+    :return: fourth order approximation at t + k - float, local error estimate per unit step - float
+    """
+    F0 = k * f(t, w)
+    F1 = k * f(t + k / 4, w + F0 / 4)
+    F2 = k * f(t + 3 * k / 8, w + 3 * F0 / 32 + 9 * F1 / 32)
+    F3 = k * f(t + 12 * k / 13, w + 1932 * F0 / 2197 - 7200 * F1 / 2197 + 7296 * F2 / 2197)
+    F4 = k * f(t + k, w + 439 * F0 / 216 - 8 * F1 + 3680 * F2 / 513 - 845 * F3 / 4104)
+    F5 = k * f(t + k / 2, w - 8 * F0 / 27 + 2 * F1 - 3544 * F2 / 2565 + 1859 * F3 / 4104 - 11 * F4 / 40)
+    R = float(numpy.max(numpy.abs(F0 / 360 - 128 * F2 / 4275 - 2197 * F3 / 75240 + F4 / 50 + 2 * F5 / 55))) / k
+    return w + 25 * F0 / 216 + 1408 * F2 / 2565 + 2197 * F3 / 4104 - F4 / 5, R
+
+
+def rkf(f, a, b, w0, tol, Kmax, Kmin, stats=None, on_step=None):
+    """
+    :param stats: if given, receives the 'accepted' and 'rejected' step counts - dict
+    """
+    w = Buffer()
+    t = Buffer()
+    w.append(w0)
+    t.append(a)
+    accepted = 0
+    rejected = 0
     k = Kmax
     flag = 1
     i = 1
     tt = a
     ww = w0
     while flag == 1:
-        F0 = k * f(tt, ww)
-        F1 = k * f(tt + k / 4, ww + F0 / 4)
-        F2 = k * f(tt + 3 * k / 8, ww + 3 * F0 / 32 + 9 * F1 / 32)
-        F3 = k * f(tt + 12 * k / 13, ww + 1932 * F0 / 2197 - 7200 * F1 / 2197 + 7296 * F2 / 2197)
-        F4 = k * f(tt + k, ww + 439 * F0 / 216 - 8 * F1 + 3680 * F2 / 513 - 845 * F3 / 4104)
-        F5 = k * f(tt + k / 2, ww - 8 * F0 / 27 + 2 * F1 - 3544 * F2 / 2565 + 1859 * F3 / 4104 - 11 * F4 / 40)
-        R = abs(F0 / 360 - 128 * F2 / 4275 - 2197 * F3 / 75240 + F4 / 50 + 2 * F5 / 55) / k
+        wn, R = rkf_step(f, tt, ww, k)
         if R <= tol:
             tt = tt + k
-            ww = ww + 25 * F0 / 216 + 1408 * F2 / 2565 + 2197 * F3 / 4104 - F4 / 5
-        delta = 0.84 * (tol / R) ** (1 / 4)
+            ww = wn
+        delta = 0.84 * (tol / R) ** (1 / 4) if R > 0 else 4
         if delta <= 0.1:
             k = 0.1*k
         elif delta >= 4:
@@ -94,25 +306,203 @@ def rkf(f, a, b, w0, tol, Kmax, Kmin):
             flag = -1
         if R <= tol:
             i += 1
-            t = numpy.append(t, tt)
-            w = numpy.append(w, ww)
-    return t, w
+            accepted += 1
+            t.append(tt)
+            w.append(ww)
+            if on_step is not None:
+                on_step(tt, ww)
+        else:
+            rejected += 1
+    if stats is not None:
+        stats['accepted'] = accepted
+        stats['rejected'] = rejected
+    return t.array(), w.array()
+
+
+def dopri_step(f, t, w, h, k1):
+    """
+    Dormand-Prince 5(4) step.
+
+    :param k1: f(t, w)
+    :return: fifth order approximation at t + h, local error estimate per unit step - float, f at the new point
+    """
+    k2 = f(t + h / 5, w + h * k1 / 5)
+    k3 = f(t + 3 * h / 10, w + h * (3 * k1 / 40 + 9 * k2 / 40))
+    k4 = f(t + 4 * h / 5, w + h * (44 * k1 / 45 - 56 * k2 / 15 + 32 * k3 / 9))
+    k5 = f(t + 8 * h / 9, w + h * (19372 * k1 / 6561 - 25360 * k2 / 2187 + 64448 * k3 / 6561 - 212 * k4 / 729))
+    k6 = f(t + h, w + h * (9017 * k1 / 3168 - 355 * k2 / 33 + 46732 * k3 / 5247 + 49 * k4 / 176
+                           - 5103 * k5 / 18656))
+    wn = w + h * (35 * k1 / 384 + 500 * k3 / 1113 + 125 * k4 / 192 - 2187 * k5 / 6784 + 11 * k6 / 84)
+    k7 = f(t + h, wn)
+    R = numpy.max(numpy.abs(71 * k1 / 57600 - 71 * k3 / 16695 + 71 * k4 / 1920 - 17253 * k5 / 339200
+                            + 22 * k6 / 525 - k7 / 40))
+    return wn, R, k7
+
 
+def control(k, R, tol, Kmax, order):
+    """
+    Step size update shared by the adaptive methods, same safety factor and bounds as rkf.
+    """
+    delta = 0.84 * (tol / R) ** (1 / order) if R > 0 else 4
+    return min(k * min(max(delta, 0.1), 4), Kmax)
 
-def pc(f, a, b, n, w0):
+
+def hermite(t, w, dw, grid):
+    """
+    Dense output of an adaptive run: cubic Hermite interpolation between its accepted points.
+
+    :param t, w, dw: times, values and derivatives returned with dense=True - array
+    :param grid: sampling times, e.g. numpy.linspace(a, b, n + 1) - array
+    :return: w at grid - array
+    """
+    i = numpy.clip(numpy.searchsorted(t, grid, side='right') - 1, 0, len(t) - 2)
+    h = t[i + 1] - t[i]
+    s = (grid - t[i]) / h
+    return (w[i] * (1 + 2 * s) * (1 - s) ** 2 + h * dw[i] * s * (1 - s) ** 2
+            + w[i + 1] * s ** 2 * (3 - 2 * s) - h * dw[i + 1] * s ** 2 * (1 - s))
+
+
+def dopri(f, a, b, w0, tol, Kmax, Kmin, stats=None, on_step=None, g=None, dense=False):
+    """
+    Adaptive Dormand-Prince 5(4), with the same tol/Kmax/Kmin meaning as rkf.
+
+    :param g: event function, e.g. Thermostat.switch_distance; a step ending past its zero is retried at half
+              size until shorter than Kmin, so steps only shrink around the switches - callable(t, w)
+    :param on_step: called after every accepted step; returning False tells that the right-hand side is
+                    unchanged, so that the last stage is reused as the next first one - callable(t, w)
+    :param dense: also return the derivatives at the accepted points, taken after on_step, for hermite - bool
+    :return: t - array, w - array (, dw - array)
+    """
+    t, w, dw = Buffer(), Buffer(), Buffer()
+    tt, ww = a, w0
+    s = f(tt, ww)
+    t.append(tt)
+    w.append(ww)
+    dw.append(s)
+    accepted = 0
+    rejected = 0
+    k = Kmax
+    while b - tt > 1e-12 * max(1, abs(b)):
+        h = min(k, b - tt)
+        wn, R, sn = dopri_step(f, tt, ww, h, s)
+        crossing = g is not None and h / 2 >= Kmin and g(tt + h, wn) <= 0
+        if R <= tol and not crossing:
+            tt, ww = tt + h, wn
+            accepted += 1
+            if on_step is not None and on_step(tt, ww) is not False:
+                sn = f(tt, ww)
+            t.append(tt)
+            w.append(ww)
+            dw.append(sn)
+            s = sn
+            k = control(h, R, tol, Kmax, 5)
+        else:
+            rejected += 1
+            k = h / 2 if crossing and R <= tol else control(h, R, tol, Kmax, 5)
+        if k < Kmin and b - tt > Kmin:
+            break
+    if stats is not None:
+        stats['accepted'] = accepted
+        stats['rejected'] = rejected
+    if dense:
+        return t.array(), w.array(), dw.array()
+    return t.array(), w.array()
+
+
+def adams_weights(nodes, t, h):
+    """
+    :param nodes: interpolation times of the derivatives - array
+    :return: weights of the derivatives in the integral of their interpolant over [t, t + h] - array
+    """
+    x = (numpy.asarray(nodes) - t) / h
+    V = numpy.vander(x, increasing=True)
+    moments = 1 / numpy.arange(1, len(x) + 1)
+    return h * numpy.linalg.solve(V.T, moments)
+
+
+def abm(f, a, b, w0, tol, Kmax, Kmin, stats=None, on_step=None, g=None, dense=False):
+    """
+    Variable-step Adams-Bashforth-Moulton of order 4, the adaptive counterpart of pc. The coefficients are
+    rebuilt from the last step sizes, which may at most double, and the error is estimated with Milne's device.
+    The first three steps, and the three after each change of the right-hand side by on_step, are taken with
+    dopri. Same arguments as dopri.
+    """
+    t, w, dw = Buffer(), Buffer(), Buffer()
+    tt, ww = a, w0
+    s = f(tt, ww)
+    t.append(tt)
+    w.append(ww)
+    dw.append(s)
+    history = [(tt, s)]
+    accepted = 0
+    rejected = 0
+    k = Kmax
+    while b - tt > 1e-12 * max(1, abs(b)):
+        h = min(k, b - tt)
+        if len(history) < 4:
+            wn, R, sn = dopri_step(f, tt, ww, h, s)
+        else:
+            nodes = [node for node, _ in history]
+            slopes = numpy.array([slope for _, slope in history])
+            wp = ww + adams_weights(nodes, tt, h) @ slopes
+            sp = f(tt + h, wp)
+            wn = ww + adams_weights([tt + h] + nodes[:3], tt, h) @ numpy.array([sp] + list(slopes[:3]))
+            R = 19 / 270 * float(numpy.max(numpy.abs(wn - wp))) / h
+            sn = f(tt + h, wn)
+        crossing = g is not None and h / 2 >= Kmin and g(tt + h, wn) <= 0
+        if R <= tol and not crossing:
+            tt, ww = tt + h, wn
+            accepted += 1
+            if on_step is not None and on_step(tt, ww) is not False:
+                switched = f(tt, ww)
+                if numpy.any(switched != sn):
+                    history = []
+                    sn = switched
+            t.append(tt)
+            w.append(ww)
+            dw.append(sn)
+            s = sn
+            history = [(tt, s)] + history[:3]
+            k = min(control(h, R, tol, Kmax, 4), 2 * h)
+        else:
+            rejected += 1
+            k = h / 2 if crossing and R <= tol else control(h, R, tol, Kmax, 4)
+        if k < Kmin and b - tt > Kmin:
+            break
+    if stats is not None:
+        stats['accepted'] = accepted
+        stats['rejected'] = rejected
+    if dense:
+        return t.array(), w.array(), dw.array()
+    return t.array(), w.array()
+
+
+def pc(f, a, b, n, w0, on_step=None, out=None, history=None):
+    """
+    :param history: derivatives at the nodes before a, most recent first, updated in place to those before b;
+                    passing the list left by a run ending at a continues that run step for step - list
+    """
     t = numpy.linspace(a, b, n + 1)
     h = (b - a) / n
-    w = numpy.zeros(n + 1)
-    w[0] = w0
-    for i in range(4):
-        s1 = f(t[i], w[i])
-        s2 = f(t[i] + h / 2, w[i] + h / 2 * s1)
-        s3 = f(t[i] + h / 2, w[i] + h / 2 * s2)
-        s4 = f(t[i] + h, w[i] + h * s3)
-        w[i + 1] = w[i] + h / 6 * (s1 + 2 * s2 + 2 * s3 + s4)
-        t[i + 1] = t[i] + h
-    for i in range(4, n):
-        w[i + 1] = w[i] + h * (55 * f(t[i], w[i]) - 59 * f(t[i - 1], w[i - 1]) + 37 * f(t[i - 2], w[i - 2]) - 9 * f(t[i - 3], w[i - 3])) / 24
-        t[i + 1] = t[i] + h
-        w[i + 1] = w[i] + h * (9 * f(t[i + 1], w[i + 1]) + 19 * f(t[i], w[i]) - 5 * f(t[i - 1], w[i - 1]) + f(t[i - 2], w[i - 2])) / 24
+    w = numpy.zeros((n + 1,) + numpy.shape(w0)) if out is None else out
+    w[0] = ww = running(w0)
+    d = [] if history is None else history
+    for i in range(n):
+        f0 = f(t[i], ww)
+        if len(d) < 4:
+            s2 = f(t[i] + h / 2, ww + h / 2 * f0)
+            s3 = f(t[i] + h / 2, ww + h / 2 * s2)
+            s4 = f(t[i] + h, ww + h * s3)
+            ww = ww + h / 6 * (f0 + 2 * s2 + 2 * s3 + s4)
+            t[i + 1] = t[i] + h
+        else:
+            f1, f2, f3 = d[0], d[1], d[2]
+            wp = ww + h * (55 * f0 - 59 * f1 + 37 * f2 - 9 * f3) / 24
+            t[i + 1] = t[i] + h
+            ww = ww + h * (9 * f(t[i + 1], wp) + 19 * f0 - 5 * f1 + f2) / 24
+        w[i + 1] = ww
+        d.insert(0, f0)
+        del d[4:]
+        if on_step is not None:
+            on_step(t[i + 1], ww)
     return t, w
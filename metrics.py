@@ -0,0 +1,153 @@
+import numpy
+
+from air_conditioner import State
+from schedule import at
+
+totals = ['energy', 'cycles', 'outside', 'peak']
+
+
+def below(a, b, level):
+    """
+    Fraction of a step spent below level, the temperature going linearly from a to b.
+
+    :param a, b: temperatures at the ends of the step - float or array
+    :param level: float or array
+    :return: float or array in [0, 1]
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        s = numpy.clip((level - a) / (b - a), 0, 1)
+    return numpy.where(a == b, a < level, numpy.where(b > a, s, 1 - s))
+
+
+def below_scalar(a, b, level):
+    if a == b:
+        return 1.0 if a < level else 0.0
+    s = min(max((level - a) / (b - a), 0.0), 1.0)
+    return s if b > a else 1 - s
+
+
+class Metrics:
+    def __init__(self, controller, t, Tr, band=None, start=None):
+        """
+        Accumulator updated once per accepted step: pass commit as the on_step of an integrator in place of
+        the controller's own commit. Works alike for one room, with plain floats, and for a batch of rooms.
+        Load is the heat exchanged with the coils, kac * |Tac - Tr|, while acting; energy is its integral,
+        a cycle runs from one stop to the next and cycles counts the starts.
+
+        :param controller: Thermostat, AirConditionerBatch or Building
+        :param t: initial time - float
+        :param Tr: initial room temperature - float or array
+        :param band: comfort band (low, high), the control temperatures if None - tuple
+        :param start: totals to carry on from, as returned by summary - dict
+        """
+        self.controller = controller
+        self.model = getattr(controller, 'airConditioner', controller)
+        self.scalar = not hasattr(controller, 'acting')
+        self.band = band
+        self.t = t
+        start = start or {}
+        if self.scalar:
+            self.Tr = float(Tr)
+            zero, self.last_start, self.last_stop = 0.0, numpy.nan, numpy.nan
+        else:
+            self.Tr = numpy.array(Tr, dtype=float)
+            zero = numpy.zeros(self.Tr.shape)
+            self.last_start = numpy.full(self.Tr.shape, numpy.nan)
+            self.last_stop = numpy.full(self.Tr.shape, numpy.nan)
+        self.load = numpy.where(self.acting(), self.power(t, self.Tr), 0.0) + zero
+        self.energy = zero + start.get('energy', 0.0)
+        self.cycles = zero + start.get('cycles', 0)
+        self.outside = zero + start.get('outside', 0.0)
+        self.peak = zero + start.get('peak', 0.0)
+        self.stop_energy = zero
+        self.records = []
+
+    def acting(self):
+        if self.scalar:
+            return self.controller.state == State.ACTING
+        return self.controller.acting
+
+    def power(self, t, Tr):
+        return self.model.kac * abs(at(self.model.Tac, t) - Tr)
+
+    def comfort(self, t):
+        if self.band is not None:
+            return self.band
+        return at(self.model.Tc_low, t), at(self.model.Tc_high, t)
+
+    def commit(self, t, Tr):
+        """
+        :param t: time - float
+        :param Tr: room temperature(s) - float or array
+        :return: whether the controller switched - bool
+        """
+        if self.scalar:
+            return self.commit_scalar(t, Tr)
+        Tr = numpy.asarray(Tr, dtype=float)
+        acting = self.acting()
+        load = numpy.where(acting, self.power(t, Tr), 0.0)
+        self.energy = self.energy + (self.load + load) / 2 * (t - self.t)
+        self.peak = numpy.maximum(self.peak, numpy.maximum(self.load, load))
+        low, high = self.comfort(t)
+        self.outside = self.outside + (below(self.Tr, Tr, low) + below(-self.Tr, -Tr, -high)) * (t - self.t)
+        switched = self.controller.commit(t, Tr)
+        after = self.acting()
+        starts = ~acting & after
+        stops = acting & ~after
+        if starts.any():
+            self.cycles = self.cycles + starts
+            self.last_start = numpy.where(starts, t, self.last_start)
+        if stops.any():
+            rooms = numpy.flatnonzero(stops)
+            period = (t - self.last_stop).ravel()[rooms]
+            on_time = (t - self.last_start).ravel()[rooms]
+            energy = (self.energy - self.stop_energy).ravel()[rooms]
+            self.records.extend(zip(rooms.tolist(), [t] * len(rooms), period.tolist(), on_time.tolist(),
+                                    energy.tolist()))
+            self.last_stop = numpy.where(stops, t, self.last_stop)
+            self.stop_energy = numpy.where(stops, self.energy, self.stop_energy)
+        self.load = numpy.where(after, self.power(t, Tr), 0.0)
+        self.t = t
+        self.Tr = Tr
+        return switched
+
+    def commit_scalar(self, t, Tr):
+        Tr = float(Tr)
+        acting = self.acting()
+        load = self.power(t, Tr) if acting else 0.0
+        self.energy += (self.load + load) / 2 * (t - self.t)
+        self.peak = max(self.peak, self.load, load)
+        low, high = self.comfort(t)
+        self.outside += (below_scalar(self.Tr, Tr, low) + below_scalar(-self.Tr, -Tr, -high)) * (t - self.t)
+        switched = self.controller.commit(t, Tr)
+        after = self.acting()
+        if after and not acting:
+            self.cycles += 1
+            self.last_start = t
+        elif acting and not after:
+            self.records.append((0, t, t - self.last_stop, t - self.last_start, self.energy - self.stop_energy))
+            self.last_stop = t
+            self.stop_energy = self.energy
+        self.load = self.power(t, Tr) if after else 0.0
+        self.t = t
+        self.Tr = Tr
+        return switched
+
+    def summary(self):
+        """
+        :return: energy, number of starts, time outside the comfort band and peak load - dict of float or array
+        """
+        values = self.energy, self.cycles, self.outside, self.peak
+        return {name: float(value) if self.scalar else value for name, value in zip(totals, values)}
+
+    def cycles_of(self, room=0):
+        """
+        Every complete cycle of a room, i.e. every stop preceded by another one; the first period of the
+        controller is the first of them.
+
+        :param room: index in the batch, 0 for a single room - int
+        :return: end time, period, on time, duty cycle and energy of each cycle - dict of array
+        """
+        rows = numpy.array([r[1:] for r in self.records if r[0] == room and not numpy.isnan(r[2])]).reshape(-1, 4)
+        end, period, on_time, energy = rows.T
+        return {'end': end, 'period': period, 'on_time': on_time, 'duty': on_time / period, 'energy': energy}
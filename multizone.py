@@ -0,0 +1,150 @@
+import numpy
+
+from batch import AirConditionerBatch
+from methods import taylor2, rkf, abm, dopri, backward_euler, crank_nicolson, bdf2
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+
+class Conductance:
+    def __init__(self, rows, cols, values, size):
+        """
+        Heat exchanged between zones, dT_i/dt += sum_j G_ij (T_j - T_i), held in CSR form.
+        Every pair is given once per direction, so a symmetric G lists (i, j) and (j, i).
+
+        :param rows, cols: zone indices of the nonzero entries - int array
+        :param values: conductances divided by the heat capacity of zone i - array
+        :param size: number of zones - int
+        """
+        rows = numpy.asarray(rows, dtype=numpy.intp)
+        cols = numpy.asarray(cols, dtype=numpy.intp)
+        values = numpy.asarray(values, dtype=float)
+        if numpy.any(values < 0):
+            print("Please check conductances' coherence.")
+        kept = rows != cols
+        rows, cols, values = rows[kept], cols[kept], values[kept].astype(float)
+        order = numpy.lexsort((cols, rows))
+        self.size = size
+        self.indices = cols[order]
+        self.data = values[order]
+        self.indptr = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(rows, minlength=size))))
+        self.rows = numpy.repeat(numpy.arange(size), numpy.diff(self.indptr))
+        self.degree = numpy.bincount(self.rows, weights=self.data, minlength=size).astype(float)
+        if sparse is not None:
+            self.matrix = sparse.csr_matrix((self.data, self.indices, self.indptr), shape=(size, size)) \
+                - sparse.diags(self.degree)
+        else:
+            self.matrix = None
+
+    @classmethod
+    def from_matrix(cls, G):
+        """
+        :param G: dense array or scipy.sparse matrix, the diagonal being ignored
+        """
+        if hasattr(G, 'tocoo'):
+            G = G.tocoo()
+            return cls(G.row, G.col, G.data, G.shape[0])
+        G = numpy.asarray(G, dtype=float)
+        rows, cols = numpy.nonzero(G)
+        return cls(rows, cols, G[rows, cols], G.shape[0])
+
+    @classmethod
+    def chain(cls, size, g):
+        """
+        Zones side by side in a row, each exchanging g with its neighbours.
+        """
+        i = numpy.arange(size - 1)
+        return cls(numpy.concatenate((i, i + 1)), numpy.concatenate((i + 1, i)), numpy.full(2 * (size - 1), g), size)
+
+    def dot(self, T):
+        """
+        :param T: zone temperatures - array
+        :return: sum_j G_ij (T_j - T_i) - array
+        """
+        if self.matrix is not None:
+            return self.matrix @ T
+        return numpy.bincount(self.rows, weights=self.data * T[self.indices], minlength=self.size) - self.degree * T
+
+    def diagonal(self):
+        return -self.degree
+
+    def toarray(self):
+        G = numpy.zeros((self.size, self.size))
+        G[self.rows, self.indices] = self.data
+        return G - numpy.diag(self.degree)
+
+
+class Building(AirConditionerBatch):
+    def __init__(self, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, conductance):
+        """
+        N zones with their own air conditioner and thermostat, coupled through conductance.
+        Zone parameters are scalars or arrays as in AirConditionerBatch; state and bookkeeping are
+        arrays, so there is no Python object per zone.
+
+        :param conductance: Conductance, dense array or scipy.sparse matrix
+        """
+        super().__init__(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode)
+        if not isinstance(conductance, Conductance):
+            conductance = Conductance.from_matrix(conductance)
+        if conductance.size != self.Tr.size:
+            print("Please check conductance matrix size.")
+        self.conductance = conductance
+
+    def flow(self, t, Tr):
+        """
+        One sparse matrix-vector product on top of the uncoupled rooms.
+
+        :param t: time - float
+        :param Tr: zone temperatures - array
+        :return: dTr/dt - array
+        """
+        return super().flow(t, Tr) + self.conductance.dot(Tr)
+
+    def flow_t(self, t, Tr):
+        return numpy.zeros_like(Tr)
+
+    def flow_y(self, t, Tr):
+        """
+        Diagonal of the Jacobian, the coupling being left to the off-diagonal terms of jacobian.
+
+        :return: d(dTr_i/dt)/dTr_i - array
+        """
+        return super().act_y(t, Tr) + self.conductance.diagonal()
+
+    def jacobian(self, t, Tr):
+        """
+        Full Jacobian, for the Newton iterations of the implicit methods and the second order term of taylor2;
+        dense when scipy is missing.
+
+        :return: scipy.sparse matrix or 2-D array
+        """
+        if self.conductance.matrix is None:
+            return self.conductance.toarray() + numpy.diag(super().act_y(t, Tr))
+        return self.conductance.matrix + sparse.diags(super().act_y(t, Tr))
+
+
+def simulate(method, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, conductance, tf, n=None, tol=0.1, Kmax=0.1,
+             Kmin=0.01):
+    """
+    Steps every zone at once with an integrator of methods, switching committed once per accepted step.
+
+    :param method: euler, taylor2, trapezium, mean, rk4, pc, backward_euler, crank_nicolson, bdf2, rkf, dopri
+                   or abm
+    :param tf: time extension for analysis - float
+    :param n: step number for the fixed-step methods - int
+    :return: t - array, T - (points, zones) array, period - array, action time - array
+    """
+    building = Building(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, conductance)
+    if method in (rkf, dopri, abm):
+        t, T = method(building.flow, 0, tf, building.Tr, tol, Kmax, Kmin, on_step=building.commit)
+    elif method is taylor2:
+        t, T = taylor2(building.flow, building.flow_t, building.jacobian, 0, tf, n, building.Tr,
+                       on_step=building.commit)
+    elif method in (backward_euler, crank_nicolson, bdf2):
+        t, T = method(building.flow, building.jacobian, 0, tf, n, building.Tr, on_step=building.commit)
+    else:
+        t, T = method(building.flow, 0, tf, n, building.Tr, on_step=building.commit)
+    return t, T, building.get_period(), building.get_action_time()
@@ -0,0 +1,84 @@
+from time import time
+
+import numpy
+
+from air_conditioner import AirConditioner
+from methods import euler, taylor2, trapezium, mean, rk4, rkf, pc
+from exact import exact
+from kernels import solve, start, resume, backend_for, warm
+
+methods = {
+    'euler': euler,
+    'taylor2': taylor2,
+    'trapezium': trapezium,
+    'mean': mean,
+    'rk4': rk4,
+    'rkf': rkf,
+    'pc': pc,
+}
+
+
+def run(method, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, tf, n, tol, kmin, kmax):
+    """
+    Runs one integrator on its own AirConditioner, compiled when numba is available and the run is long enough;
+    picklable, so it can be sent to a process pool. Compiling or loading the kernels is not timed.
+
+    :param method: key of methods - str
+    :return: t - array, T - array, period - float, action time - float, elapsed time in ms - float
+    """
+    airConditioner = AirConditioner(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode)
+    backend = backend_for(method, airConditioner, 0, tf, n, kmax)
+    if backend == 'jit':
+        warm()
+    start = time()
+    t, T, period, action_time = solve(method, airConditioner, 0, tf, n, Tr, tol, kmax, kmin, backend)
+    end = time()
+    return t, T, period, action_time, (end - start) * 1000
+
+
+def resume_run(method, Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, checkpoint, tf, n, tol, kmin, kmax):
+    """
+    Carries a run on up to tf, so that a longer horizon only costs the added part.
+
+    :param checkpoint: as returned by a previous call, None to start at t = 0 from Tr - dict
+    :param n: step number from the checkpoint to tf - int
+    :return: t - array, T - array, period - float, action time - float, elapsed time in ms - float,
+             checkpoint at tf - dict
+    """
+    airConditioner = AirConditioner(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode)
+    if checkpoint is None:
+        checkpoint = start(airConditioner, 0, Tr)
+    backend = backend_for(method, airConditioner, checkpoint['t'], tf, n, kmax)
+    if backend == 'jit':
+        warm()
+    begin = time()
+    t, T, period, action_time, checkpoint = resume(method, airConditioner, checkpoint, tf, n, tol, kmax, kmin,
+                                                   backend)
+    end = time()
+    return t, T, period, action_time, (end - begin) * 1000, checkpoint
+
+
+def resume_ground_truth(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode, checkpoint, tf, n=100000):
+    """
+    :param checkpoint: as returned by a previous call, None to start at t = 0 from Tr - dict
+    :param n: step number from the checkpoint to tf - int
+    :return: t - array, T - array, period - float, action time - float, checkpoint at tf - dict
+    """
+    airConditioner = AirConditioner(Tr, Tac, Tout, k, kac, Tc_low, Tc_high, mode)
+    a, w0 = 0, Tr
+    if checkpoint is not None:
+        a, w0 = checkpoint['t'], checkpoint['w']
+        airConditioner.restore(checkpoint['thermostat'])
+    t, T = exact(airConditioner, a, tf, n, w0)
+    checkpoint = {'t': t[-1], 'w': T[-1], 'thermostat': airConditioner.save(), 'history': []}
+    return t, T, airConditioner.get_period(), airConditioner.get_action_time(), checkpoint
+
+
+def error_curves(t_truth, truth, results):
+    """
+    :param t_truth, truth: reference trajectory - array
+    :param results: name -> (t, T, ...) of each method - dict
+    :return: name -> (t, |T - reference|) on the method's own grid - dict
+    """
+    return {name: (result[0], numpy.abs(result[1] - numpy.interp(result[0], t_truth, truth)))
+            for name, result in results.items()}
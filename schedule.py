@@ -0,0 +1,152 @@
+import csv
+import json
+import os
+
+import numpy
+
+
+class Schedule:
+    def __init__(self, values, dt, t0=0, kind='linear', periodic=False):
+        """
+        Time series sampled on a uniform grid, t0 + i * dt, so that every evaluation is one index computation
+        whatever the series length. 'step' and 'linear' read the two samples around t straight from values, a
+        numpy.memmap staying on disk; 'cubic' computes its coefficients once and holds them in memory.
+        Held at its end values outside the grid unless periodic.
+
+        :param values: samples, one row per grid point, possibly one column per room - array or numpy.memmap
+        :param dt: grid spacing - float
+        :param t0: first grid time - float
+        :param kind: 'step', 'linear' or 'cubic' (C1 cubic Hermite with centred slopes) - str
+        :param periodic: whether values cover one period, the point after the last being the first - bool
+        """
+        values = numpy.asarray(values, dtype=float)
+        if len(values) == 0 or dt <= 0:
+            raise ValueError("a schedule needs at least one sample and a positive dt")
+        if kind not in ('step', 'linear', 'cubic'):
+            raise ValueError("unknown interpolation kind " + repr(kind))
+        self.coefficients = None
+        if kind == 'cubic':
+            if periodic:
+                knots = numpy.concatenate((values, values[:1]))
+            elif len(values) == 1:
+                knots = numpy.concatenate((values, values))
+            else:
+                knots = values
+            delta = numpy.diff(knots, axis=0)
+            slopes = numpy.empty_like(knots)
+            slopes[1:-1] = (knots[2:] - knots[:-2]) / 2
+            if periodic:
+                slopes[0] = slopes[-1] = (knots[1] - knots[-2]) / 2
+            else:
+                slopes[0] = delta[0]
+                slopes[-1] = delta[-1]
+            self.coefficients = [slopes[:-1] + slopes[1:] - 2 * delta, 3 * delta - 2 * slopes[:-1] - slopes[1:],
+                                 slopes[:-1], knots[:-1]]
+        self.values = values
+        self.dt = dt
+        self.t0 = t0
+        self.kind = kind
+        self.periodic = periodic
+        self.count = len(values) if periodic else max(len(values) - 1, 1)
+
+    def __call__(self, t):
+        """
+        :param t: time - float or array
+        :return: interpolated value - float, or array for an array t or multi-column values
+        """
+        s = (t - self.t0) / self.dt
+        if self.periodic:
+            s = s % self.count
+        if isinstance(s, numpy.ndarray):
+            i = numpy.clip(numpy.floor(s).astype(int), 0, self.count - 1)
+            u = numpy.clip(s - i, 0, 1)
+            if self.values.ndim > 1:
+                u = u.reshape(u.shape + (1,) * (self.values.ndim - 1))
+        else:
+            i = min(max(int(s // 1), 0), self.count - 1)
+            u = min(max(s - i, 0), 1)
+        if self.kind == 'step':
+            return self.values[i]
+        if self.kind == 'linear':
+            low = self.values[i]
+            return (self.values[(i + 1) % len(self.values)] - low) * u + low
+        result = self.coefficients[0][i]
+        for c in self.coefficients[1:]:
+            result = result * u + c[i]
+        return result
+
+    def __len__(self):
+        return len(self.values)
+
+    def end(self):
+        return self.t0 + (len(self.values) - 1) * self.dt
+
+
+def at(value, t):
+    """
+    :param value: constant or Schedule
+    :param t: time - float
+    :return: the value in force at t
+    """
+    if isinstance(value, Schedule):
+        return value(t)
+    return value
+
+
+def scheduled(*values):
+    """
+    :return: whether any of values is a Schedule - bool
+    """
+    return any(isinstance(value, Schedule) for value in values)
+
+
+def load_csv(path, column, time_column=None, dt=None, kind='linear', periodic=False, cache=None, chunk=65536):
+    """
+    Streams one column of a uniformly sampled CSV, e.g. an hourly weather file, into a raw float64 file and
+    returns a Schedule over a read-only numpy.memmap of it, so the series is never held in memory.
+    The raw file is reused as long as it is newer than the CSV and was made with the same time_column and dt.
+
+    :param column: name of the value column - str
+    :param time_column: name of the time column giving t0 and dt, checked to be uniform - str
+    :param dt: grid spacing when there is no time column - float
+    :param cache: raw file path, defaults to path.column.f8 - str
+    :param chunk: rows parsed between two writes - int
+    :return: Schedule
+    """
+    if time_column is None and dt is None:
+        raise ValueError("either time_column or dt is needed")
+    if cache is None:
+        cache = path + '.' + column + '.f8'
+    grid_path = cache + '.grid'
+    settings = {'time_column': time_column, 'dt': dt}
+    grid = None
+    if os.path.exists(cache) and os.path.exists(grid_path) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        try:
+            with open(grid_path) as file:
+                grid = json.load(file)
+        except ValueError:
+            grid = None
+    if grid is None or grid['settings'] != settings:
+        t0, step, last, count = 0.0, dt, None, 0
+        rows = []
+        with open(path, newline='') as file, open(cache, 'wb') as raw:
+            for row in csv.DictReader(file):
+                if time_column is not None:
+                    t = float(row[time_column])
+                    if count == 0:
+                        t0 = t
+                    elif count == 1 and dt is None:
+                        step = t - t0
+                    if count > 0 and abs(t - last - step) > 1e-9 * abs(step):
+                        raise ValueError("%s is not uniformly sampled near %s = %g" % (path, time_column, t))
+                    last = t
+                rows.append(float(row[column]))
+                count += 1
+                if len(rows) == chunk:
+                    numpy.array(rows).tofile(raw)
+                    rows = []
+            numpy.array(rows, dtype=float).tofile(raw)
+        grid = {'settings': settings, 't0': t0, 'dt': step if step is not None else 1.0}
+        with open(grid_path, 'w') as file:
+            json.dump(grid, file)
+    return Schedule(numpy.memmap(cache, dtype='float64', mode='r'), grid['dt'], grid['t0'], kind, periodic)
@@ -0,0 +1,53 @@
+import numpy
+
+from air_conditioner import Mode
+
+
+def phase(T_from, T_to, rate, Teq):
+    """
+    Time for T to relax from T_from to T_to towards Teq, inf where it never gets there.
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ratio = (T_from - Teq) / (T_to - Teq)
+        return numpy.where(ratio > 1, numpy.log(numpy.where(ratio > 1, ratio, 1)) / rate, numpy.inf)
+
+
+def limit_cycle(Tac, Tout, k, kac, Tc_low, Tc_high, mode):
+    """
+    Periodic steady state between Tc_low and Tc_high, from the analytic switching map, for any number of
+    configurations at once. Every parameter is a scalar or an array, as in batch.AirConditionerBatch.
+
+    :param mode: Mode or sequence of Mode
+    :return: period, on time per cycle, duty cycle and average power kac * |Tac - Tr| exchanged with the coils
+             - arrays; an air conditioner that never stops has an infinite period and a duty cycle of 1,
+             one that never starts an infinite period and a duty cycle of 0
+    """
+    Tac, Tout, k, kac, Tc_low, Tc_high = numpy.broadcast_arrays(
+        *(numpy.asarray(p, dtype=float) for p in (Tac, Tout, k, kac, Tc_low, Tc_high)))
+    if isinstance(mode, Mode):
+        cool = numpy.full(Tac.shape, mode == Mode.COOL)
+    else:
+        cool = numpy.broadcast_to(numpy.array([m == Mode.COOL for m in mode]), Tac.shape)
+    rate = k + kac
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        Teq = (k * Tout + kac * Tac) / rate
+    start = numpy.where(cool, Tc_high, Tc_low)
+    stop = numpy.where(cool, Tc_low, Tc_high)
+    on = phase(start, stop, rate, Teq)
+    off = phase(stop, start, k, Tout)
+    period = on + off
+    cycling = numpy.isfinite(period)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        exchanged = numpy.abs((Tac - Teq) * on - (start - stop) / rate) * kac
+        duty = numpy.where(cycling, on / period, numpy.where(numpy.isfinite(off), 1.0, 0.0))
+        power = numpy.where(cycling, exchanged / period, numpy.where(numpy.isfinite(off), kac * numpy.abs(Tac - Teq), 0.0))
+    return period, numpy.where(cycling, on, numpy.where(duty == 1, numpy.inf, 0.0)), duty, power
+
+
+def cycle(airConditioner):
+    """
+    :param airConditioner: AirConditioner
+    :return: period, on time, duty cycle, average power - float
+    """
+    ac = airConditioner
+    return tuple(float(x) for x in limit_cycle(ac.Tac, ac.Tout, ac.k, ac.kac, ac.Tc_low, ac.Tc_high, ac.mode))
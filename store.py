@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+
+import numpy
+
+
+def serialize(value, **kwargs):
+    """
+    The one JSON encoding of the store, for run ids and index.json alike: values JSON does not know, e.g. a
+    Mode, are written as their str.
+    """
+    return json.dumps(value, sort_keys=True, default=str, **kwargs)
+
+
+def plain(params):
+    """
+    :return: params as the index keeps them, raising before anything is stored if they cannot be encoded - dict
+    """
+    return json.loads(serialize(params))
+
+
+class TrajectoryStore:
+    def __init__(self, directory):
+        """
+        Trajectories kept as raw binary files next to an index.json of their parameters,
+        reopened as read-only numpy.memmap without copying.
+
+        :param directory: str
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, 'index.json')
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                self.index = json.load(file)
+        else:
+            self.index = {}
+
+    def key(self, params):
+        """
+        :param params: simulation parameters, JSON values or values written as their str such as a Mode - dict
+        :return: run id - str
+        """
+        return hashlib.sha1(serialize(params).encode()).hexdigest()
+
+    def save_index(self):
+        """
+        Writes index.json through a temporary file renamed into place, so that an interrupted write leaves
+        the previous index whole.
+        """
+        text = serialize(self.index, indent=1)
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(text)
+        os.replace(temporary, self.index_path)
+
+    def create(self, params, a, b, n, shape=(), dtype='float64'):
+        """
+        Allocates a file-backed w for a fixed-step run of methods, to be passed as its out argument.
+        The uniform grid is rebuilt from a, b and n, so t is not stored.
+
+        :return: writable numpy.memmap of shape (n + 1,) + shape
+        """
+        params = plain(params)
+        run = self.key(params)
+        self.index[run] = {'params': params, 'a': a, 'b': b, 'n': n, 'count': n + 1, 'shape': list(shape),
+                           'dtype': numpy.dtype(dtype).name, 'decimate': 1, 'grid': 'uniform'}
+        self.save_index()
+        return numpy.memmap(os.path.join(self.directory, run + '.w'), dtype=dtype, mode='w+',
+                            shape=(n + 1,) + tuple(shape))
+
+    def write(self, params, chunks, dtype='float64', decimate=1):
+        """
+        Appends a stream of (t, w) chunks, e.g. from stream, to disk without holding the whole trajectory.
+
+        :param dtype: storage type of w, 'float32' halves the files - str
+        :param decimate: keep one point out of decimate - int
+        :return: run id - str
+        """
+        params = plain(params)
+        run = self.key(params)
+        count = 0
+        shape = ()
+        with open(os.path.join(self.directory, run + '.t'), 'wb') as t_file, \
+                open(os.path.join(self.directory, run + '.w'), 'wb') as w_file:
+            for t, w in chunks:
+                kept = numpy.arange(-count % decimate, len(t), decimate)
+                count += len(t)
+                shape = w.shape[1:]
+                t_file.write(numpy.asarray(t[kept], dtype='float64').tobytes())
+                w_file.write(numpy.asarray(w[kept], dtype=dtype).tobytes())
+        self.index[run] = {'params': params, 'count': (count + decimate - 1) // decimate, 'shape': list(shape),
+                           'dtype': numpy.dtype(dtype).name, 'decimate': decimate, 'grid': 'stored'}
+        self.save_index()
+        return run
+
+    def open(self, run):
+        """
+        :param run: run id or parameters - str or dict
+        :return: t - array, w - read-only numpy.memmap
+        """
+        if isinstance(run, dict):
+            run = self.key(run)
+        entry = self.index[run]
+        shape = (entry['count'],) + tuple(entry['shape'])
+        w = numpy.memmap(os.path.join(self.directory, run + '.w'), dtype=entry['dtype'], mode='r', shape=shape)
+        if entry['grid'] == 'uniform':
+            t = numpy.linspace(entry['a'], entry['b'], entry['n'] + 1)
+        else:
+            t = numpy.memmap(os.path.join(self.directory, run + '.t'), dtype='float64', mode='r',
+                             shape=(entry['count'],))
+        return t, w
+
+    def find(self, **criteria):
+        """
+        :return: ids of the runs whose parameters contain every given value - list
+        """
+        criteria = plain(criteria)
+        return [run for run, entry in self.index.items()
+                if all(entry['params'].get(name) == value for name, value in criteria.items())]
+
+    def remove(self, run):
+        for suffix in ('.t', '.w'):
+            path = os.path.join(self.directory, run + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        del self.index[run]
+        self.save_index()
@@ -0,0 +1,220 @@
+from functools import partial
+
+import numpy
+
+from air_conditioner import Thermostat
+from methods import euler_step, taylor2_step, trapezium_step, mean_step, rk4_step, rkf_step
+from metrics import Metrics
+
+
+class Chunks:
+    def __init__(self, w0, size):
+        """
+        Fills fixed-size (t, w) chunks; a full chunk is handed over and a fresh one started,
+        so no more than one chunk is ever held.
+
+        :param w0: initial value, only its shape is used
+        :param size: points per chunk - int
+        """
+        self.shape = numpy.shape(w0)
+        self.size = size
+        self.new()
+
+    def new(self):
+        self.t = numpy.empty(self.size)
+        self.w = numpy.empty((self.size,) + self.shape)
+        self.count = 0
+
+    def add(self, t, w):
+        """
+        :return: the full chunk, None otherwise
+        """
+        self.t[self.count] = t
+        self.w[self.count] = w
+        self.count += 1
+        if self.count == self.size:
+            full = self.t, self.w
+            self.new()
+            return full
+        return None
+
+    def rest(self):
+        return self.t[:self.count], self.w[:self.count]
+
+
+def fixed(step, f, a, b, n, w0, chunk=4096, on_step=None):
+    """
+    Generator counterpart of the fixed-step integrators of methods.
+
+    :param step: euler_step, trapezium_step, mean_step, rk4_step or partial(taylor2_step, ft=..., fy=...)
+    :param chunk: points per yielded chunk - int
+    :return: generator of (t, w) chunks covering a..b
+    """
+    h = (b - a) / n
+    chunks = Chunks(w0, chunk)
+    chunks.add(a, w0)
+    tt, ww = a, w0
+    for i in range(n):
+        ww = step(f, tt, ww, h)
+        tt = a + (i + 1) * h
+        if on_step is not None:
+            on_step(tt, ww)
+        full = chunks.add(tt, ww)
+        if full is not None:
+            yield full
+    if chunks.count:
+        yield chunks.rest()
+
+
+def euler(f, a, b, n, w0, chunk=4096, on_step=None):
+    return fixed(euler_step, f, a, b, n, w0, chunk, on_step)
+
+
+def taylor2(f, ft, fy, a, b, n, w0, chunk=4096, on_step=None):
+    return fixed(partial(taylor2_step, ft=ft, fy=fy), f, a, b, n, w0, chunk, on_step)
+
+
+def trapezium(f, a, b, n, w0, chunk=4096, on_step=None):
+    return fixed(trapezium_step, f, a, b, n, w0, chunk, on_step)
+
+
+def mean(f, a, b, n, w0, chunk=4096, on_step=None):
+    return fixed(mean_step, f, a, b, n, w0, chunk, on_step)
+
+
+def rk4(f, a, b, n, w0, chunk=4096, on_step=None):
+    return fixed(rk4_step, f, a, b, n, w0, chunk, on_step)
+
+
+def pc(f, a, b, n, w0, chunk=4096, on_step=None):
+    """
+    Same scheme as methods.pc, keeping only the last four derivatives.
+    """
+    h = (b - a) / n
+    chunks = Chunks(w0, chunk)
+    chunks.add(a, w0)
+    tt, ww = a, w0
+    history = []
+    for i in range(n):
+        if i < 4:
+            history.insert(0, f(tt, ww))
+            ww = rk4_step(f, tt, ww, h)
+        else:
+            history = [f(tt, ww)] + history[:3]
+            wp = ww + h * (55 * history[0] - 59 * history[1] + 37 * history[2] - 9 * history[3]) / 24
+            ww = ww + h * (9 * f(tt + h, wp) + 19 * history[0] - 5 * history[1] + history[2]) / 24
+        tt = tt + h  # accumulated as methods.pc does
+        if on_step is not None:
+            on_step(tt, ww)
+        full = chunks.add(tt, ww)
+        if full is not None:
+            yield full
+    if chunks.count:
+        yield chunks.rest()
+
+
+def rkf(f, a, b, w0, tol, Kmax, Kmin, chunk=4096, on_step=None):
+    """
+    Same step control as methods.rkf.
+    """
+    chunks = Chunks(w0, chunk)
+    chunks.add(a, w0)
+    tt, ww = a, w0
+    k = Kmax
+    flag = 1
+    while flag == 1:
+        wn, R = rkf_step(f, tt, ww, k)
+        if R <= tol:
+            tt = tt + k
+            ww = wn
+        delta = 0.84 * (tol / R) ** (1 / 4) if R > 0 else 4
+        if delta <= 0.1:
+            k = 0.1 * k
+        elif delta >= 4:
+            k = 4 * k
+        else:
+            k = delta * k
+        if k > Kmax:
+            k = Kmax
+        if tt >= b:
+            flag = 0
+        if tt + k >= b:
+            k = b - tt
+        if k < Kmin:
+            flag = -1
+        if R <= tol:
+            if on_step is not None:
+                on_step(tt, ww)
+            full = chunks.add(tt, ww)
+            if full is not None:
+                yield full
+    if chunks.count:
+        yield chunks.rest()
+
+
+class Summary:
+    def __init__(self):
+        """
+        Running minimum, maximum and time-weighted mean of a streamed trajectory.
+        """
+        self.minimum = numpy.inf
+        self.maximum = -numpy.inf
+        self.area = 0
+        self.duration = 0
+        self.last = None
+
+    def update(self, t, w):
+        if len(t) == 0:
+            return
+        self.minimum = min(self.minimum, numpy.min(w))
+        self.maximum = max(self.maximum, numpy.max(w))
+        if self.last is not None:
+            t = numpy.concatenate(([self.last[0]], t))
+            w = numpy.concatenate(([self.last[1]], w))
+        self.area += numpy.sum((w[1:] + w[:-1]) * numpy.diff(t)) / 2
+        self.duration += t[-1] - t[0]
+        self.last = t[-1], w[-1]
+
+    def mean(self):
+        return self.area / self.duration if self.duration else self.last[1]
+
+
+class Metering(Metrics):
+    def __init__(self, airConditioner, Tr, t=0):
+        """
+        Metrics of a new Thermostat of airConditioner, among them the heat exchanged with the coils,
+        kac * |Tac - Tr|, while acting; the thermostat's flow and getters are exposed so that a stream can run
+        on it directly, with commit as on_step.
+
+        :param airConditioner: AirConditioner
+        :param Tr: initial room temperature - float
+        :param t: initial time - float
+        """
+        super().__init__(Thermostat(airConditioner, Tr, t), t, Tr)
+        self.flow = self.controller.flow
+        self.flow_t = self.controller.flow_t
+        self.flow_y = self.controller.flow_y
+        self.get_period = self.controller.get_period
+        self.get_action_time = self.controller.get_action_time
+
+    def get_energy(self):
+        return self.energy
+
+
+def drain(chunks, sink=None, reducers=()):
+    """
+    Consumes a stream, pushing every chunk to sink and to the update method of every reducer.
+
+    :param chunks: generator of (t, w) chunks
+    :param sink: callable(t, w)
+    :param reducers: e.g. Summary() - sequence
+    :return: number of points streamed - int
+    """
+    count = 0
+    for t, w in chunks:
+        count += len(t)
+        if sink is not None:
+            sink(t, w)
+        for reducer in reducers:
+            reducer.update(t, w)
+    return count
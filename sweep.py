@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import itertools
+import os
+
+import numpy
+
+from air_conditioner import AirConditioner, Mode, defaults
+from exact import exact
+from metrics import below
+from runs import run
+
+metrics = ['period', 'action_time', 'violation']
+
+
+def grid(**values):
+    """
+    :param values: parameter name -> sequence of values
+    :return: every combination - list of dict
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def latin_hypercube(size, seed=None, **bounds):
+    """
+    :param size: number of points - int
+    :param bounds: parameter name -> (low, high)
+    :return: points, each parameter range cut in size strata sampled once - list of dict
+    """
+    rng = numpy.random.default_rng(seed)
+    columns = {name: low + (high - low) * (rng.permutation(size) + rng.random(size)) / size
+               for name, (low, high) in bounds.items()}
+    return [{name: float(column[i]) for name, column in columns.items()} for i in range(size)]
+
+
+def random_design(size, seed=None, **bounds):
+    rng = numpy.random.default_rng(seed)
+    columns = {name: rng.uniform(low, high, size) for name, (low, high) in bounds.items()}
+    return [{name: float(column[i]) for name, column in columns.items()} for i in range(size)]
+
+
+def evaluate(point, method='exact', tf=1000, n=10000, tol=0.1, kmin=0.01, kmax=0.1):
+    """
+    :param point: AirConditioner parameters differing from defaults - dict
+    :param method: 'exact' or a method of runs
+    :return: period, action time and time spent outside [Tc_low, Tc_high] - dict
+    """
+    p = dict(defaults, **point)
+    mode = Mode[p['mode']] if isinstance(p['mode'], str) else p['mode']
+    if method == 'exact':
+        airConditioner = AirConditioner(p['Tr'], p['Tac'], p['Tout'], p['k'], p['kac'], p['Tc_low'], p['Tc_high'], mode)
+        t, T = exact(airConditioner, 0, tf, n, p['Tr'])
+        period, action_time = airConditioner.get_period(), airConditioner.get_action_time()
+    else:
+        t, T, period, action_time, _ = run(method, p['Tr'], p['Tac'], p['Tout'], p['k'], p['kac'], p['Tc_low'],
+                                           p['Tc_high'], mode, tf, n, tol, kmin, kmax)
+    violation = time_below(t, T, p['Tc_low']) + time_below(t, -T, -p['Tc_high'])
+    return {'period': float(period), 'action_time': float(action_time), 'violation': float(violation)}
+
+
+def time_below(t, T, level):
+    """
+    Time spent below level by the piecewise linear interpolant of (t, T), smooth in the parameters
+    so that finite differences of it make sense.
+    """
+    return numpy.sum(below(T[:-1], T[1:], level) * numpy.diff(t))
+
+
+def evaluate_chunk(indices, points, options):
+    return [(index, evaluate(point, **options)) for index, point in zip(indices, points)]
+
+
+def sweep(points, path, workers=None, chunk=64, **options):
+    """
+    Evaluates every point in a process pool, chunk points per task, appending one row per point to the CSV
+    at path as soon as its chunk is done. Rerunning with the same path resumes: finished rows are skipped.
+
+    :param points: design, e.g. from grid or latin_hypercube - list of dict
+    :param options: keyword arguments of evaluate
+    :return: the tidy table, one row per point - list of dict
+    """
+    names = sorted(set(defaults) | set().union(*points))
+    done = set()
+    resuming = os.path.exists(path) and os.path.getsize(path) > 0
+    if resuming:
+        with open(path, newline='') as file:
+            done = {int(row['index']) for row in csv.DictReader(file)}
+    todo = [i for i in range(len(points)) if i not in done]
+    with open(path, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['index'] + names + metrics)
+        if not resuming:
+            writer.writeheader()
+        with ProcessPoolExecutor(workers) as executor:
+            tasks = [executor.submit(evaluate_chunk, todo[i:i + chunk], [points[j] for j in todo[i:i + chunk]], options)
+                     for i in range(0, len(todo), chunk)]
+            for task in as_completed(tasks):
+                for index, result in task.result():
+                    writer.writerow(dict(defaults, **points[index], index=index, **result))
+                file.flush()
+    return load(path)
+
+
+def load(path):
+    with open(path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    for row in rows:
+        for name, value in row.items():
+            if name != 'mode':
+                row[name] = int(value) if name == 'index' else float(value)
+    return sorted(rows, key=lambda row: row['index'])
+
+
+def sensitivity(point, names=('k', 'kac', 'Tac', 'Tout', 'Tc_low', 'Tc_high'), relative_step=1e-3, **options):
+    """
+    Central finite differences of the metrics of evaluate with respect to the given parameters.
+
+    :return: parameter name -> metric name -> derivative - dict
+    """
+    p = dict(defaults, **point)
+    derivatives = {}
+    for name in names:
+        h = relative_step * max(abs(p[name]), 1)
+        upper = evaluate(dict(p, **{name: p[name] + h}), **options)
+        lower = evaluate(dict(p, **{name: p[name] - h}), **options)
+        derivatives[name] = {metric: (upper[metric] - lower[metric]) / (2 * h) for metric in metrics}
+    return derivatives
@@ -0,0 +1,25 @@
+import numpy
+import pytest
+
+from air_conditioner import AirConditioner, Mode
+from batch import simulate
+from methods import euler, taylor2, trapezium, mean, rk4, pc
+
+rooms = [(18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT),
+         (30, 5, 35, 0.03, 0.1, 22, 24, Mode.COOL),
+         (20, 35, 10, 0.05, 0.2, 21, 23, Mode.HEAT)]
+
+
+@pytest.mark.parametrize('method', [euler, taylor2, trapezium, mean, rk4, pc])
+def test_batch_matches_scalar_runs(method):
+    t, T, period, action_time = simulate(method, *zip(*rooms), 100, 500)
+    for j, room in enumerate(rooms):
+        ac = AirConditioner(*room)
+        if method is taylor2:
+            _, w = method(ac.act, ac.act_t, ac.act_y, 0, 100, 500, room[0])
+        else:
+            _, w = method(ac.act, 0, 100, 500, room[0])
+        numpy.testing.assert_array_equal(T[:, j], w)
+        assert period[j] == ac.get_period()
+        # Summed over the cycles in another order, the action time may differ in the last bits
+        assert action_time[j] == pytest.approx(ac.get_action_time(), rel=1e-12)
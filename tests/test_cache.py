@@ -0,0 +1,27 @@
+import numpy
+
+from air_conditioner import Mode
+from cache import ResultCache
+from runs import resume_run
+
+
+def test_results_survive_the_disk(tmp_path):
+    key = (18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT, 100, 'RK4', 1000)
+    t, T, period, action_time, elapsed, checkpoint = resume_run('rk4', *key[:8], None, 100, 1000, 0.1, 0.01, 0.1)
+    result = (t, T, period, action_time, elapsed, checkpoint['metrics'])
+    ResultCache(directory=str(tmp_path)).put(key, result)
+    loaded = ResultCache(directory=str(tmp_path)).get(key)
+    assert len(loaded) == len(result)
+    numpy.testing.assert_array_equal(loaded[0], t)
+    numpy.testing.assert_array_equal(loaded[1], T)
+    assert loaded[2:5] == (period, action_time, elapsed)
+    assert loaded[5] == checkpoint['metrics']
+
+
+def test_ground_truth_results_survive_the_disk(tmp_path):
+    key = ('truth',)
+    result = (numpy.linspace(0, 1, 5), numpy.ones(5), -1, 0.0)
+    ResultCache(directory=str(tmp_path)).put(key, result)
+    loaded = ResultCache(directory=str(tmp_path)).get(key)
+    numpy.testing.assert_array_equal(loaded[1], result[1])
+    assert loaded[2:] == (-1, 0.0)
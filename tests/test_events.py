@@ -0,0 +1,49 @@
+import numpy
+import pytest
+
+from air_conditioner import AirConditioner, Mode
+import events
+from exact import segments
+
+room = (18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT)
+
+
+def run(name, n):
+    ac = AirConditioner(*room)
+    times = []
+
+    def on_event(t, w):
+        times.append(t)
+        ac.switch(t, w)
+
+    t, w = getattr(events, name)(ac.flow, ac.switch_distance, on_event, 0, 100, n, room[0])
+    return t, w, times
+
+
+@pytest.mark.parametrize('name', ['euler', 'trapezium', 'mean', 'rk4', 'pc'])
+def test_event_points_are_inserted_in_the_grid(name):
+    t, w, times = run(name, 1000)
+    grid = numpy.linspace(0, 100, 1001)
+    assert numpy.all(numpy.diff(t) > 0)
+    assert numpy.isin(grid, t).all()
+    assert len(t) == len(grid) + len(numpy.setdiff1d(times, grid))
+
+
+@pytest.mark.parametrize('name', ['rk4', 'pc'])
+def test_events_are_located_at_the_exact_switching_times(name):
+    exact = [start for start, _, _ in segments(AirConditioner(*room), 0, 100, room[0])[1:]]
+    times = run(name, 1000)[2]
+    numpy.testing.assert_allclose(times, exact, atol=1e-6)
+
+
+@pytest.mark.parametrize('name', ['euler', 'rk4', 'pc'])
+def test_an_event_on_a_grid_node_is_given_once(name):
+    # w = t crosses 1 on the node t = 1, where the event flips the sign of g
+    sign = [1]
+
+    def on_event(t, w):
+        sign[0] = -sign[0]
+
+    t, w = getattr(events, name)(lambda t, w: 1.0, lambda t, w: sign[0] * (1 - w), on_event, 0, 2, 2, 0.0)
+    assert t.tolist() == [0, 1, 2]
+    assert sign == [-1]
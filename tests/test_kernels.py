@@ -0,0 +1,36 @@
+import numpy
+import pytest
+
+from air_conditioner import AirConditioner, Mode
+import kernels
+
+rooms = [(18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT),
+         (30, 5, 35, 0.03, 0.1, 22, 24, Mode.COOL)]
+names = ['euler', 'taylor2', 'trapezium', 'mean', 'rk4', 'pc', 'rkf']
+
+
+@pytest.mark.skipif(not kernels.JIT, reason="numba is not installed")
+@pytest.mark.parametrize('room', rooms)
+@pytest.mark.parametrize('method', names)
+def test_kernels_match_methods(method, room):
+    ac = AirConditioner(*room)
+    python = kernels.resume(method, ac, kernels.start(ac, 0, room[0]), 200, 2000, backend='python')
+    jit = kernels.resume(method, ac, kernels.start(ac, 0, room[0]), 200, 2000, backend='jit')
+    numpy.testing.assert_array_equal(jit[0], python[0])
+    numpy.testing.assert_array_equal(jit[1], python[1])
+    assert jit[2:4] == python[2:4]
+    assert jit[4]['thermostat'] == python[4]['thermostat']
+    assert jit[4]['history'] == python[4]['history']
+    assert jit[4]['metrics'] == python[4]['metrics']
+
+
+@pytest.mark.parametrize('method', names[:-1])
+def test_resume_continues_a_fixed_step_run(method):
+    room = rooms[0]
+    ac = AirConditioner(*room)
+    whole = kernels.resume(method, ac, kernels.start(ac, 0, room[0]), 200, 2000, backend='python')
+    first = kernels.resume(method, ac, kernels.start(ac, 0, room[0]), 100, 1000, backend='python')
+    second = kernels.resume(method, ac, first[4], 200, 1000, backend='python')
+    # Both halves space their own times, which may differ from those of the whole run in the last bits
+    numpy.testing.assert_allclose(numpy.concatenate([first[1], second[1][1:]]), whole[1], rtol=1e-12)
+    assert second[2:4] == pytest.approx(whole[2:4], rel=1e-12)
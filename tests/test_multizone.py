@@ -0,0 +1,27 @@
+import numpy
+import pytest
+
+from air_conditioner import Mode
+from methods import taylor2, rk4
+from multizone import Conductance, simulate
+
+Tr = numpy.array([15.0, 25.0, 20.0])
+
+
+def last(method, conductance, n):
+    # Control band wide enough that no zone switches, so only the coupling is tested
+    return simulate(method, Tr, 35, 15, 0.03, 0.1, -100, 100, Mode.HEAT, conductance, 20, n=n)[1][-1]
+
+
+def test_taylor2_is_second_order_on_a_coupled_building():
+    chain = Conductance.chain(3, 0.2)
+    reference = last(rk4, chain, 20000)
+    errors = [numpy.abs(last(taylor2, chain, n) - reference).max() for n in (40, 80, 160)]
+    assert errors[0] / errors[1] == pytest.approx(4, rel=0.1)
+    assert errors[1] / errors[2] == pytest.approx(4, rel=0.1)
+
+
+def test_building_without_links():
+    empty = Conductance([], [], [], 3)
+    numpy.testing.assert_array_equal(empty.dot(Tr), numpy.zeros(3))
+    assert numpy.all(numpy.isfinite(last(rk4, empty, 100)))
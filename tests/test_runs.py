@@ -0,0 +1,18 @@
+import numpy
+
+from air_conditioner import Mode
+from runs import error_curves, resume_ground_truth, resume_run
+
+room = (18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT)
+
+
+def test_error_curves_against_the_ground_truth():
+    t_truth, truth = resume_ground_truth(*room, None, 100, 10000)[:2]
+    result = resume_run('rk4', *room, None, 100, 500, 0.1, 0.01, 0.1)
+    curves = error_curves(t_truth, truth, {'truth': (t_truth, truth), 'rk4': result})
+    numpy.testing.assert_array_equal(curves['truth'][1], numpy.zeros(len(t_truth)))
+    t, error = curves['rk4']
+    assert t is result[0]
+    numpy.testing.assert_allclose(error, numpy.abs(result[1] - numpy.interp(t, t_truth, truth)))
+    # Before the first switching the run follows the exact exponential closely
+    assert error[:10].max() < 1e-6
@@ -0,0 +1,39 @@
+import numpy
+
+from schedule import Schedule, load_csv
+
+
+def write_csv(path, count):
+    with open(path, 'w') as file:
+        file.write('hour,Tout\n')
+        for i in range(count):
+            file.write('%d,%g\n' % (i, 10 + i % 7))
+
+
+def test_linear_schedule_reads_the_memmap_in_place(tmp_path):
+    path = str(tmp_path / 'weather.csv')
+    write_csv(path, 100)
+    schedule = load_csv(path, 'Tout', dt=2)
+    assert schedule.coefficients is None
+    assert isinstance(schedule.values.base, numpy.memmap)
+    assert schedule(5) == (10 + 2 + 10 + 3) / 2
+    numpy.testing.assert_array_equal(schedule(numpy.array([0, 4, 1000])), [10, 12, 10 + 99 % 7])
+
+
+def test_load_csv_rebuilds_the_grid_for_other_settings(tmp_path):
+    path = str(tmp_path / 'weather.csv')
+    write_csv(path, 10)
+    assert load_csv(path, 'Tout', dt=2).dt == 2
+    assert load_csv(path, 'Tout', dt=3).dt == 3
+    assert load_csv(path, 'Tout', time_column='hour').dt == 1
+
+
+def test_kinds_agree_on_the_samples():
+    values = numpy.array([[1.0, 4.0], [3.0, 2.0], [0.0, 5.0]])
+    for kind in ('step', 'linear', 'cubic'):
+        for periodic in (False, True):
+            schedule = Schedule(values, 0.5, 1, kind, periodic)
+            numpy.testing.assert_array_equal(schedule(numpy.array([1, 1.5])), values[:2])
+            if kind != 'step':
+                numpy.testing.assert_array_equal(schedule(2), values[2])
+    assert Schedule(values, 0.5, 1, 'linear', periodic=True)(2.25).tolist() == [0.5, 4.5]
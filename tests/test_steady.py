@@ -0,0 +1,41 @@
+import math
+
+import pytest
+
+from air_conditioner import AirConditioner, Mode, State
+from exact import exact, segments
+from steady import cycle
+
+cycling = [(18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT),
+           (30, 5, 35, 0.03, 0.1, 22, 24, Mode.COOL),
+           (20, 35, 10, 0.05, 0.2, 21, 23, Mode.HEAT)]
+
+
+@pytest.mark.parametrize('room', cycling)
+def test_exact_settles_on_the_steady_cycle(room):
+    ac = AirConditioner(*room)
+    period, on, duty, _ = cycle(ac)
+    exact(ac, 0, 1000, 1000, room[0])
+    assert ac.get_period() == pytest.approx(period, rel=1e-12)
+    segs = segments(AirConditioner(*room), 0, 1000, room[0])
+    acting = [(start[0], end[0]) for start, end in zip(segs, segs[1:]) if start[2] == State.ACTING]
+    assert acting[-1][1] - acting[-1][0] == pytest.approx(on, rel=1e-12)
+    assert duty == pytest.approx(on / period)
+
+
+def test_never_stopping_has_no_period():
+    room = (18, 25, 15, 0.03, 0.1, 22, 24, Mode.HEAT)
+    ac = AirConditioner(*room)
+    period, on, duty, _ = cycle(ac)
+    exact(ac, 0, 1000, 1000, room[0])
+    assert ac.get_period() == -1
+    assert math.isinf(period) and math.isinf(on) and duty == 1
+
+
+def test_never_starting_has_no_period():
+    room = (18, 35, 23, 0.03, 0.1, 22, 24, Mode.HEAT)
+    ac = AirConditioner(*room)
+    period, on, duty, _ = cycle(ac)
+    exact(ac, 0, 1000, 1000, room[0])
+    assert ac.get_period() == -1
+    assert math.isinf(period) and on == 0 and duty == 0
@@ -0,0 +1,32 @@
+import numpy
+
+from air_conditioner import AirConditioner, Mode, Thermostat
+import methods
+from store import TrajectoryStore
+
+ac = AirConditioner(18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT)
+
+
+def test_float32_storage_only_rounds_what_is_stored(tmp_path):
+    store = TrajectoryStore(str(tmp_path))
+    out = store.create({'method': 'euler'}, 0, 1000, 100000, dtype='float32')
+    stored = Thermostat(ac, 18)
+    methods.euler(stored.flow, 0, 1000, 100000, 18, stored.commit, out=out)
+    full = Thermostat(ac, 18)
+    _, w = methods.euler(full.flow, 0, 1000, 100000, 18, full.commit)
+    numpy.testing.assert_array_equal(out, w.astype('float32'))
+    assert stored.get_period() == full.get_period()
+
+
+def test_index_takes_a_mode_and_survives_bad_params(tmp_path):
+    store = TrajectoryStore(str(tmp_path))
+    store.create({'method': 'rk4', 'mode': Mode.HEAT}, 0, 1, 10)
+    try:
+        store.create({'method': 'euler', (1, 2): 'not a JSON key'}, 0, 1, 10)
+    except TypeError:
+        pass
+    reopened = TrajectoryStore(str(tmp_path))
+    assert len(reopened.index) == 1
+    assert reopened.find(mode=Mode.HEAT) == store.find(method='rk4') == list(reopened.index)
+    t, w = reopened.open({'method': 'rk4', 'mode': Mode.HEAT})
+    assert len(t) == len(w) == 11
@@ -0,0 +1,55 @@
+import numpy
+import pytest
+
+from air_conditioner import AirConditioner, Mode, Thermostat
+from metrics import Metrics
+import methods
+import stream
+
+ac = AirConditioner(18, 35, 15, 0.03, 0.1, 22, 24, Mode.HEAT)
+
+
+def gather(chunks):
+    parts = list(chunks)
+    return numpy.concatenate([t for t, _ in parts]), numpy.concatenate([w for _, w in parts])
+
+
+@pytest.mark.parametrize('name', ['euler', 'trapezium', 'mean', 'rk4', 'pc'])
+def test_fixed_step_streams_match_methods(name):
+    whole = Thermostat(ac, 18)
+    t, w = getattr(methods, name)(whole.flow, 0, 100, 1000, 18, whole.commit)
+    streamed = Thermostat(ac, 18)
+    ts, ws = gather(getattr(stream, name)(streamed.flow, 0, 100, 1000, 18, chunk=128, on_step=streamed.commit))
+    numpy.testing.assert_array_equal(ts, t)
+    numpy.testing.assert_array_equal(ws, w)
+    assert streamed.get_period() == whole.get_period()
+    assert streamed.get_action_time() == whole.get_action_time()
+
+
+def test_taylor2_stream_matches_methods():
+    whole = Thermostat(ac, 18)
+    t, w = methods.taylor2(whole.flow, whole.flow_t, whole.flow_y, 0, 100, 1000, 18, whole.commit)
+    streamed = Thermostat(ac, 18)
+    ts, ws = gather(stream.taylor2(streamed.flow, streamed.flow_t, streamed.flow_y, 0, 100, 1000, 18, chunk=128,
+                                   on_step=streamed.commit))
+    numpy.testing.assert_array_equal(ts, t)
+    numpy.testing.assert_array_equal(ws, w)
+
+
+def test_rkf_stream_matches_methods():
+    whole = Thermostat(ac, 18)
+    t, w = methods.rkf(whole.flow, 0, 100, 18, 0.01, 0.5, 0.001, on_step=whole.commit)
+    streamed = Thermostat(ac, 18)
+    ts, ws = gather(stream.rkf(streamed.flow, 0, 100, 18, 0.01, 0.5, 0.001, chunk=50, on_step=streamed.commit))
+    numpy.testing.assert_array_equal(ts, t)
+    numpy.testing.assert_array_equal(ws, w)
+    assert streamed.get_period() == whole.get_period()
+
+
+def test_metering_matches_metrics():
+    meter = Metrics(Thermostat(ac, 18), 0, 18)
+    methods.rk4(meter.controller.flow, 0, 1000, 10000, 18, meter.commit)
+    metering = stream.Metering(ac, 18)
+    stream.drain(stream.rk4(metering.flow, 0, 1000, 10000, 18, chunk=256, on_step=metering.commit))
+    assert metering.summary() == meter.summary()
+    assert metering.get_period() == meter.controller.get_period()
@@ -0,0 +1,22 @@
+from sweep import grid, load, sweep
+
+points = grid(k=[0.02, 0.03, 0.04], Tac=[30, 35])
+options = {'tf': 200, 'n': 1000}
+
+
+def test_sweep_resumes_an_interrupted_csv(tmp_path):
+    whole = sweep(points, tmp_path / 'whole.csv', workers=2, chunk=2, **options)
+    assert [row['index'] for row in whole] == list(range(len(points)))
+    lines = (tmp_path / 'whole.csv').read_text().splitlines(keepends=True)
+    # As if interrupted once the header and three rows were written
+    (tmp_path / 'resumed.csv').write_text(''.join(lines[:4]))
+    resumed = sweep(points, tmp_path / 'resumed.csv', workers=2, chunk=2, **options)
+    assert resumed == whole
+    assert len((tmp_path / 'resumed.csv').read_text().splitlines()) == len(lines)
+
+
+def test_sweep_skips_finished_rows(tmp_path):
+    path = tmp_path / 'sweep.csv'
+    first = sweep(points, path, workers=1, **options)
+    assert sweep(points, path, workers=1, **options) == first
+    assert load(path) == first
@@ -1,5 +1,8 @@
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from time import time
+import multiprocessing
+
+import numpy
 
 
 class Integrator(Enum):
@@ -13,17 +16,29 @@ class Integrator(Enum):
     COUNT = 8
 
 
+int_names = {
+    Integrator.EULER: "Euler",
+    Integrator.TAYLOR2: "Taylor2",
+    Integrator.TRAPEZIUM: "Trapezium",
+    Integrator.MEAN: "Mean",
+    Integrator.RK4: "RK4",
+    Integrator.RKF: "RKF",
+    Integrator.PC: "PC",
+}
+
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
 from matplotlib.backends.backend_gtk3agg import (
     FigureCanvasGTK3Agg as FigureCanvas)
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_gtk3 import NavigationToolbar2GTK3 as NavigationToolbar
 from matplotlib.figure import Figure
 
-from air_conditioner import AirConditioner, Mode
-from methods import euler, taylor2, trapezium, mean, rk4, rkf, pc
+from air_conditioner import Mode
+from runs import resume_run, resume_ground_truth, error_curves
+from cache import ResultCache
+from decimate import Traces
 
 def create_param_spin(title, initial, callback, increment):
     adjustment = Gtk.Adjustment(upper=2000, step_increment=increment, page_increment=1)
@@ -75,15 +90,25 @@ class MatWindow(Gtk.Window):
         self.kmin = 0.01
         self.kmax = 0.1
         self.mode = Mode.HEAT
-        self.airConditioner = AirConditioner(self.Tr, self.Tac, self.Tout, self.k, self.kac, self.Tc_low, self.Tc_high, self.mode)
         self.integrators = [False] * Integrator.COUNT.value
-        self.int_functions = [euler, taylor2, trapezium, mean, rk4, rkf, pc]
-        self.int_res = [( [1], [1], 0, 0, 0 )] * Integrator.COUNT.value
-        self.t_truth = []
-        self.ground_truth = []
+        self.int_res = [( [1], [1], 0, 0, 0, None )] * Integrator.COUNT.value
+        self.t_truth = numpy.empty(0)
+        self.ground_truth = numpy.empty(0)
         self.period_truth = 0
         self.action_time_truth = 0
 
+        self.int_ready = [False] * Integrator.COUNT.value
+        self.show_errors = False
+        self.errors = {}  # integrator name -> (ground truth, T, error curve) it was computed from
+        self.cache_directory = None  # set to a path to keep results across sessions
+        self.truth_cache = ResultCache(maxsize=16, directory=self.cache_directory)
+        self.int_cache = ResultCache(maxsize=128, directory=self.cache_directory)
+        self.checkpoints = {}  # run without tf -> (tf, cache key, checkpoint) of its longest horizon
+        self.executor = None
+        self.futures = []
+        self.generation = 0
+        self.connect("destroy", self.on_destroy)
+
         self.set_border_width(10)
         self.set_default_size(1920, 1080)
         self.first_sim_run = False
@@ -160,10 +185,14 @@ class MatWindow(Gtk.Window):
         self.int_box.add(int_rk4)
         self.int_box.add(int_rkf)
         self.int_box.add(int_pc)
+        self.int_box.add(create_integrator_type_checkbox("Error vs Ground Truth: ", self.toggle_errors))
 
         sim_button = Gtk.Button.new_with_label("Simulate")
         sim_button.connect("clicked", self.simulate)
         self.int_box.pack_end(sim_button, False, True, 0)
+        cancel_button = Gtk.Button.new_with_label("Cancel")
+        cancel_button.connect("clicked", self.cancel)
+        self.int_box.pack_end(cancel_button, False, True, 0)
 
         frame2 = Gtk.Frame()
         frame2.set_shadow_type(Gtk.ShadowType.IN)
@@ -177,204 +206,197 @@ class MatWindow(Gtk.Window):
         self.ax.set_ylabel('room temperature')
         self.canvas = FigureCanvas(self.fig)  # a Gtk.DrawingArea
         self.canvas.set_size_request(800, 600)
-        frame2.add(self.canvas)
-
-    def calc_ground_truth(self):
-        n = 100000
-        self.airConditioner = AirConditioner(self.Tr, self.Tac, self.Tout, self.k, self.kac, self.Tc_low, self.Tc_high, self.mode)
-        self.airConditioner.reset_timer()
-
-        t, Teuler = euler(self.airConditioner.act, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.EULER.value] = (t, Teuler, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-
-        self.airConditioner.reset_timer()
-        t, Ttaylor2 = taylor2(self.airConditioner.act, self.airConditioner.act_t, self.airConditioner.act_y, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.TAYLOR2.value] = (t, Ttaylor2, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-
-        self.airConditioner.reset_timer()
-        t, Ttrapezium = trapezium(self.airConditioner.act, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.TRAPEZIUM.value] = (t, Ttrapezium, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-
-        self.airConditioner.reset_timer()
-        t, Ttmean = mean(self.airConditioner.act, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.MEAN.value] = (t, Ttmean, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-
-        self.airConditioner.reset_timer()
-        t, Ttrk4 = rk4(self.airConditioner.act, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.RK4.value] = (t, Ttrk4, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-
-        self.airConditioner.reset_timer()
-        t, Ttpc = pc(self.airConditioner.act, 0, self.tf, n, self.Tr)
-        self.int_res[Integrator.PC.value] = (t, Ttpc, self.airConditioner.get_period(), self.airConditioner.get_action_time())
-       
-        self.ground_truth = []
-        self.t_truth = []
-        for v in range(len(t)):
-            s = 0
-            for i in range(Integrator.COUNT.value - 1):
-                idx = i + 1
-                if idx == Integrator.RKF.value:
-                    continue
-                s = s + self.int_res[idx][1][v]
-            self.ground_truth.append(s / (Integrator.COUNT.value - 2))
-            self.t_truth.append(t[v])
-
-        p = 0
-        a = 0
-        for i in range(Integrator.COUNT.value - 1):
-            idx = i + 1
-            if idx == Integrator.RKF.value:
-                continue
-            p = p + self.int_res[idx][2]
-            a = a + self.int_res[idx][3]
-        self.period_truth = p / (Integrator.COUNT.value - 2)
-        self.action_time_truth = a / (Integrator.COUNT.value - 2)
+        self.traces = Traces(self.ax)
+        plot_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        plot_box.pack_start(self.canvas, True, True, 0)
+        plot_box.pack_start(NavigationToolbar(self.canvas), False, False, 0)
+        self.status = Gtk.Label()
+        self.status.set_halign(Gtk.Align.START)
+        plot_box.pack_start(self.status, False, False, 0)
+        frame2.add(plot_box)
 
     def simulate(self, button):
-        self.calc_ground_truth()
-
-        self.airConditioner = AirConditioner(self.Tr, self.Tac, self.Tout, self.k, self.kac, self.Tc_low, self.Tc_high, self.mode)
-        self.airConditioner.reset_timer()
-
-        start = time()
-        t, Teuler = euler(self.airConditioner.act, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.EULER.value] = (t, Teuler, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttaylor2 = taylor2(self.airConditioner.act, self.airConditioner.act_t, self.airConditioner.act_y, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.TAYLOR2.value] = (t, Ttaylor2, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttrapezium = trapezium(self.airConditioner.act, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.TRAPEZIUM.value] = (t, Ttrapezium, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttmean = mean(self.airConditioner.act, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.MEAN.value] = (t, Ttmean, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttrk4 = rk4(self.airConditioner.act, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.RK4.value] = (t, Ttrk4, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttrkf = rkf(self.airConditioner.act, 0, self.tf, self.Tr, self.tol, self.kmax, self.kmin)
-        end = time()
-        self.int_res[Integrator.RKF.value] = (t, Ttrkf, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-
-        self.airConditioner.reset_timer()
-        start = time()
-        t, Ttpc = pc(self.airConditioner.act, 0, self.tf, self.n, self.Tr)
-        end = time()
-        self.int_res[Integrator.PC.value] = (t, Ttpc, self.airConditioner.get_period(), self.airConditioner.get_action_time(), (end - start) * 1000)
-                    
+        self.cancel(button)
+        self.first_sim_run = False
+        self.int_ready = [False] * Integrator.COUNT.value
+        self.status.set_text("")
+
+        base = (self.Tr, self.Tac, self.Tout, self.k, self.kac, self.Tc_low, self.Tc_high, self.mode)
+        params = base + (self.tf,)
+        cached = self.truth_cache.get(params)
+        if cached is not None:
+            self.t_truth, self.ground_truth, self.period_truth, self.action_time_truth = cached
+            self.first_sim_run = True
+        else:
+            checkpoint, prefix = self.prefix(self.truth_cache, base)
+            n = 100000
+            if prefix is not None:
+                n = max(1, round((self.tf - checkpoint['t']) / (prefix[0][1] - prefix[0][0])))
+            future = self.submit(resume_ground_truth, *base, checkpoint, self.tf, n)
+            self.watch(future, self.on_ground_truth, params, base, prefix)
+        for integrator in Integrator:
+            if integrator == Integrator.COUNT:
+                continue
+            if integrator == Integrator.RKF:
+                key = params + (integrator.name, self.tol, self.kmin, self.kmax)
+                series = base + (integrator.name, self.tol, self.kmin, self.kmax)
+            else:
+                key = params + (integrator.name, self.n)
+                series = base + (integrator.name, self.tf / self.n)
+            cached = self.int_cache.get(key)
+            if cached is not None:
+                self.int_res[integrator.value] = cached
+                self.int_ready[integrator.value] = True
+                continue
+            checkpoint, prefix = self.prefix(self.int_cache, series)
+            n = self.n
+            if prefix is not None:
+                n = self.n - (len(prefix[0]) - 1)
+            future = self.submit(resume_run, integrator.name.lower(), *base, checkpoint, self.tf, n,
+                                 self.tol, self.kmin, self.kmax)
+            self.watch(future, self.on_result, key, integrator.value, series, prefix)
+        self.plot(button)
 
+    def prefix(self, cache, series):
+        """
+        Longest cached run of the same series on a shorter horizon, so that only the rest is computed:
+        same parameters but tf, and the same step size for the fixed-step methods.
+
+        :return: its checkpoint and result, (None, None) if there is none
+        """
+        if series not in self.checkpoints:
+            return None, None
+        tf, key, checkpoint = self.checkpoints[series]
+        prefix = cache.get(key)
+        if prefix is None or tf >= self.tf:
+            return None, None
+        return checkpoint, prefix
+
+    def extend(self, series, key, result, prefix):
+        """
+        :param result: output of resume_run or resume_ground_truth, checkpoint last
+        :param prefix: cached result that result carries on, or None
+        :return: result over the whole horizon, the checkpoint replaced by the metrics totals it holds, if any
+        """
+        tf, checkpoint = key[8], result[-1]  # keys start with the eight parameters then tf
+        if series not in self.checkpoints or self.checkpoints[series][0] < tf:
+            self.checkpoints[series] = (tf, key, checkpoint)
+        result = result[:-1]
+        if prefix is not None:
+            t = numpy.concatenate((prefix[0], result[0][1:]))
+            T = numpy.concatenate((prefix[1], result[1][1:]))
+            result = (t, T) + result[2:4] + tuple(old + new for old, new in zip(prefix[4:5], result[4:]))
+        if 'metrics' in checkpoint:
+            result += (checkpoint['metrics'],)
+        return result
+
+    def submit(self, fn, *args):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return self.executor.submit(fn, *args)
+
+    def watch(self, future, callback, *args):
+        generation = self.generation
+        self.futures.append(future)
+        future.add_done_callback(lambda done: GLib.idle_add(callback, generation, done, *args))
+
+    def report(self, name, error):
+        """
+        Shows the failure of a worker in the status line, one line per failed run.
+        """
+        line = name + " failed: " + type(error).__name__ + ": " + str(error)
+        text = self.status.get_text()
+        self.status.set_text(text + "\n" + line if text else line)
+
+    def on_ground_truth(self, generation, future, key, series, prefix):
+        if generation != self.generation or future.cancelled():
+            return False
+        try:
+            result = future.result()
+        except Exception as error:
+            self.report("Ground Truth", error)
+            return False
+        result = self.extend(series, key, result, prefix)
+        self.truth_cache.put(key, result)
+        self.t_truth, self.ground_truth, self.period_truth, self.action_time_truth = result
         self.first_sim_run = True
-
-        self.plot(button)
+        self.plot(None)
+        return False
+
+    def on_result(self, generation, future, key, idx, series, prefix):
+        if generation != self.generation or future.cancelled():
+            return False
+        try:
+            result = future.result()
+        except Exception as error:
+            self.report(int_names[Integrator(idx)], error)
+            return False
+        result = self.extend(series, key, result, prefix)
+        self.int_cache.put(key, result)
+        self.int_res[idx] = result
+        self.int_ready[idx] = True
+        self.plot(None)
+        return False
+
+    def cancel(self, button):
+        for future in self.futures:
+            future.cancel()
+        self.futures = []
+        self.generation += 1
+
+    def on_destroy(self, window):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
     def plot(self, button):
         if (not self.first_sim_run):
             return
 
-        self.ax.clear()
-        self.ax.set_title('Air conditioning a room')
-        self.ax.set_xlabel('t')
-        self.ax.set_ylabel('room temperature')
-        self.ax.grid(True)
         period = round(self.period_truth, 4)
         action_time = round(self.action_time_truth, 4)
-        self.ax.plot(self.t_truth, self.ground_truth, label="Ground Truth, Period = " + str(period) + ", Action Time = " + str(action_time))
-
-        if (self.integrators[Integrator.EULER.value] == True):
-            t = self.int_res[Integrator.EULER.value][0]
-            Teuler = self.int_res[Integrator.EULER.value][1]
-            period = self.int_res[Integrator.EULER.value][2]
-            action_time = self.int_res[Integrator.EULER.value][3]
-            time_elapsed = self.int_res[Integrator.EULER.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Teuler, label="Euler, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.TAYLOR2.value] == True):
-            t = self.int_res[Integrator.TAYLOR2.value][0]
-            Ttaylor2 = self.int_res[Integrator.TAYLOR2.value][1]
-            period = self.int_res[Integrator.TAYLOR2.value][2]
-            action_time = self.int_res[Integrator.TAYLOR2.value][3]
-            time_elapsed = self.int_res[Integrator.TAYLOR2.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttaylor2, label="Taylor2, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.TRAPEZIUM.value] == True):
-            t = self.int_res[Integrator.TRAPEZIUM.value][0]
-            Ttrapezium = self.int_res[Integrator.TRAPEZIUM.value][1]
-            period = self.int_res[Integrator.TRAPEZIUM.value][2]
-            action_time = self.int_res[Integrator.TRAPEZIUM.value][3]
-            time_elapsed = self.int_res[Integrator.TRAPEZIUM.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttrapezium, label="Trapezium, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.MEAN.value] == True):
-            t = self.int_res[Integrator.MEAN.value][0]
-            Ttmean = self.int_res[Integrator.MEAN.value][1]
-            period = self.int_res[Integrator.MEAN.value][2]
-            action_time = self.int_res[Integrator.MEAN.value][3]
-            time_elapsed = self.int_res[Integrator.MEAN.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttmean, label="Mean, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.RK4.value] == True):
-            t = self.int_res[Integrator.RK4.value][0]
-            Ttrk4 = self.int_res[Integrator.RK4.value][1]
-            period = self.int_res[Integrator.RK4.value][2]
-            action_time = self.int_res[Integrator.RK4.value][3]
-            time_elapsed = self.int_res[Integrator.RK4.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttrk4, label="RK4, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.RKF.value] == True):
-            t = self.int_res[Integrator.RKF.value][0]
-            Ttrkf = self.int_res[Integrator.RKF.value][1]
-            period = self.int_res[Integrator.RKF.value][2]
-            action_time = self.int_res[Integrator.RKF.value][3]
-            time_elapsed = self.int_res[Integrator.RKF.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttrkf, label="RKF, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-        if (self.integrators[Integrator.PC.value] == True):
-            t = self.int_res[Integrator.PC.value][0]
-            Ttpc = self.int_res[Integrator.PC.value][1]
-            period = self.int_res[Integrator.PC.value][2]
-            action_time = self.int_res[Integrator.PC.value][3]
-            time_elapsed = self.int_res[Integrator.PC.value][4]
-            period = round(period, 4)
-            action_time = round(action_time, 4)
-            time_elapsed = round(time_elapsed, 4)
-            self.ax.plot(t, Ttpc, label="PC, Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms")
-
-
-        self.ax.legend()
-        self.canvas.draw()
+        self.traces.set('truth', self.t_truth, self.ground_truth, "Ground Truth, Period = " + str(period) + ", Action Time = " + str(action_time))
+        self.traces.show('truth', not self.show_errors)
+
+        for integrator in Integrator:
+            if integrator == Integrator.COUNT:
+                continue
+            idx = integrator.value
+            if self.int_ready[idx]:
+                t, T, period, action_time, time_elapsed, metrics = self.int_res[idx]
+                period = round(period, 4)
+                action_time = round(action_time, 4)
+                time_elapsed = round(time_elapsed, 4)
+                label = int_names[integrator] + ", Period = " + str(period) + ", Action Time = " + str(action_time) + ", Elapsed Time = " + str(time_elapsed) + "ms"
+                if metrics is not None:
+                    label += ", Energy = " + str(round(metrics['energy'], 4)) + ", Cycles = " + str(int(metrics['cycles']))
+                self.traces.set(integrator.name, t, T, label)
+                if self.show_errors:
+                    self.plot_error(integrator, t, T)
+            shown = self.integrators[idx] == True and self.int_ready[idx]
+            self.traces.show(integrator.name, shown and not self.show_errors)
+            self.traces.show('error ' + integrator.name, shown and self.show_errors)
+
+        self.ax.set_ylabel('|error| against the ground truth' if self.show_errors else 'room temperature')
+        self.traces.fit()
+        self.ax.legend(handles=self.traces.visible())
+        self.canvas.draw_idle()
+
+    def plot_error(self, integrator, t, T):
+        """
+        Error curve of an integrator on its own grid, recomputed only when its run or the ground truth changed.
+        """
+        old = self.errors.get(integrator.name)
+        if old is None or old[0] is not self.ground_truth or old[1] is not T:
+            curve = error_curves(self.t_truth, self.ground_truth, {integrator.name: (t, T)})[integrator.name]
+            self.errors[integrator.name] = self.ground_truth, T, curve
+        t, error = self.errors[integrator.name][2]
+        label = int_names[integrator] + ", Max Error = " + str(round(float(error.max()), 6))
+        self.traces.set('error ' + integrator.name, t, error, label)
+
+    def toggle_errors(self, check):
+        self.show_errors = not self.show_errors
+        self.traces.changed = True
+        self.plot(check)
 
     def toggle_integrator_euler(self, integrator):
         self.integrators[Integrator.EULER.value] = not self.integrators[Integrator.EULER.value]